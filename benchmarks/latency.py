@@ -0,0 +1,93 @@
+"""
+Concurrent-request latency probe for a running API.
+
+    python -m benchmarks.latency --base-url http://localhost:8000 --path /leaderboard --concurrency 50 --requests 1000
+
+Run it against two commits (e.g. before and after a change) and compare the JSON it prints.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of samples (seconds)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles in milliseconds plus throughput."""
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round((len(latencies) + errors) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+async def run_load(base_url: str, path: str, concurrency: int, total_requests: int,
+                   method: str = "GET", payloads: Optional[List[Dict[str, Any]]] = None,
+                   paths: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Sends total_requests requests to path with at most concurrency in flight and returns summarize().
+    payloads, if given, are sent as JSON bodies round-robin; paths, if given, replace path round-robin.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total_requests))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(base_url, connector=connector) as session:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                body = payloads[i % len(payloads)] if payloads else None
+                request_path = paths[i % len(paths)] if paths else path
+                start = time.perf_counter()
+                try:
+                    async with session.request(method, request_path, json=body) as resp:
+                        await resp.read()
+                        if resp.status >= 400:
+                            errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return summarize(latencies, errors, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/leaderboard")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.base_url, args.path, args.concurrency, args.requests, args.method))
+    print(json.dumps({"path": args.path, "method": args.method, "concurrency": args.concurrency, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measures per-request middleware overhead in-process, without a server or database.
+
+    python -m benchmarks.middleware --requests 20000
+
+Compares the previous BaseHTTPMiddleware ProxyFix (copied below) against the raw ASGI stack in
+middleware.py, both wrapping the same small JSON endpoint, and prints microseconds per request.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class LegacyProxyFixMiddleware(BaseHTTPMiddleware):
+    """The ProxyFix middleware main.py used before middleware.py (for comparison only)."""
+
+    async def dispatch(self, request: Request, call_next):
+        forwarded_proto = request.headers.get("x-forwarded-proto", "").lower()
+        forwarded_host = request.headers.get("x-forwarded-host", "")
+        if forwarded_proto in ["https", "http"]:
+            request.scope["scheme"] = forwarded_proto
+        if forwarded_host:
+            port = 443 if forwarded_proto == "https" else 80
+            request.scope["server"] = (forwarded_host, port)
+            headers = dict(request.scope.get("headers", []))
+            headers[b"host"] = forwarded_host.encode()
+            request.scope["headers"] = list(headers.items())
+        return await call_next(request)
+
+
+async def _endpoint(request: Request):
+    return JSONResponse({"scheme": request.url.scheme, "host": request.url.hostname})
+
+
+def _build_app(stack: str):
+    from middleware import CompressionMiddleware, ProxyFixMiddleware, ServerTimingMiddleware
+
+    app = Starlette(routes=[Route("/", _endpoint)])
+    if stack == "legacy":
+        app.add_middleware(LegacyProxyFixMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(ProxyFixMiddleware)
+        app.add_middleware(CompressionMiddleware)
+        app.add_middleware(ServerTimingMiddleware)
+    return app
+
+
+async def _time_stack(app, requests: int) -> float:
+    """Drives the ASGI app directly and returns the mean seconds per request."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/", "raw_path": b"/", "query_string": b"", "root_path": "",
+        "server": ("internal", 8000), "client": ("10.0.0.1", 50000),
+        "headers": [
+            (b"host", b"internal:8000"), (b"accept-encoding", b"gzip, br"),
+            (b"x-forwarded-proto", b"https"), (b"x-forwarded-host", b"leaderboard.example.com"),
+        ],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(min(500, requests)): # Warm up routing and any lazy imports
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def run(requests: int) -> Dict[str, Any]:
+    results = {}
+    for stack in ("none", "legacy", "asgi"):
+        results[stack] = round(await _time_stack(_build_app(stack), requests) * 1_000_000, 2)
+    return {
+        "requests": requests,
+        "us_per_request": results,
+        "overhead_us": {
+            "legacy": round(results["legacy"] - results["none"], 2),
+            "asgi": round(results["asgi"] - results["none"], 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Runs the standard API benchmark scenarios against a running server and prints one JSON report.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --size 100k
+    DATABASE_URL=sqlite:///bench.db uvicorn main:app --port 8000
+    python -m benchmarks.suite --base-url http://localhost:8000 --concurrency 10,50 --requests 500 --output before.json
+
+Each scenario reports p50/p95/p99 latency and throughput (see benchmarks.latency.summarize) per
+concurrency level. The report records the git commit so runs from two commits can be diffed:
+
+    python -m benchmarks.suite --compare before.json after.json
+
+prints every scenario and concurrency level the two reports share, with the change in p50/p95/p99 and throughput.
+Requests don't send If-None-Match, so every GET measures a full response rather than a 304;
+/leaderboard/discord is served from the image cache after its first render.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.latency import run_load
+from benchmarks.seed import FACETS
+
+SCORE_USERS = 1000 # Distinct users the /score scenario spreads its writes over
+TEAM_SAMPLE = 50 # Distinct teams the /get_team_scores scenario cycles through
+
+
+def _score_payloads(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {"user_id": f"user-{rng.randint(1, SCORE_USERS):07d}", "facet": rng.choice(FACETS), "amount": rng.randint(1, 15)}
+        for _ in range(count)
+    ]
+
+
+async def _team_paths(base_url: str, rng: random.Random) -> List[str]:
+    async with aiohttp.ClientSession(base_url) as session:
+        async with session.get("/get_teams") as resp:
+            resp.raise_for_status()
+            teams = await resp.json()
+    sample = rng.sample(teams, min(TEAM_SAMPLE, len(teams)))
+    return [f"/get_team_scores/{team}" for team in sample]
+
+
+# Scenario name -> method and path; /score payloads and team paths are generated per run
+SCENARIOS: Dict[str, Dict[str, str]] = {
+    "score": {"method": "POST", "path": "/score"},
+    "leaderboard": {"method": "GET", "path": "/leaderboard"},
+    "all_users_with_scores": {"method": "GET", "path": "/get_all_users_with_scores"},
+    "team_scores": {"method": "GET", "path": "/get_team_scores/{team}"},
+    "leaderboard_discord": {"method": "GET", "path": "/leaderboard/discord"},
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suite(base_url: str, scenarios: List[str], concurrency_levels: List[int],
+                    total_requests: int, rng_seed: int = 42) -> Dict[str, Any]:
+    rng = random.Random(rng_seed)
+    team_paths = await _team_paths(base_url, rng) if "team_scores" in scenarios else []
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in scenarios:
+        scenario = SCENARIOS[name]
+        results[name] = {}
+        for concurrency in concurrency_levels:
+            payloads = _score_payloads(total_requests, rng) if name == "score" else None
+            paths = team_paths if name == "team_scores" else None
+            if name == "team_scores" and not paths:
+                results[name][str(concurrency)] = {"skipped": "no teams"}
+                continue
+            results[name][str(concurrency)] = await run_load(
+                base_url, scenario["path"], concurrency, total_requests,
+                method=scenario["method"], payloads=payloads, paths=paths
+            )
+            print(f"[BENCH] {name} @ {concurrency}: {results[name][str(concurrency)]}", file=sys.stderr)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "base_url": base_url,
+        "requests_per_run": total_requests,
+        "concurrency": concurrency_levels,
+        "results": results,
+    }
+
+
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare_reports(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    """
+    A table of COMPARED_METRICS per scenario and concurrency level found in both reports (runs that were
+    skipped in either are left out). For latencies a negative change is an improvement; for throughput, positive.
+    """
+    lines = [
+        f"before: {before.get('commit') or 'unknown commit'} ({before.get('timestamp', '?')})",
+        f"after:  {after.get('commit') or 'unknown commit'} ({after.get('timestamp', '?')})",
+        "",
+        f"{'scenario':<24}{'conc':>6}  {'metric':<16}{'before':>12}{'after':>12}{'change':>10}",
+    ]
+    for name, runs in before["results"].items():
+        for concurrency, before_run in runs.items():
+            after_run = after["results"].get(name, {}).get(concurrency)
+            if after_run is None or "skipped" in before_run or "skipped" in after_run:
+                continue
+            for metric in COMPARED_METRICS:
+                lines.append(
+                    f"{name:<24}{concurrency:>6}  {metric:<16}{before_run[metric]:>12.3f}{after_run[metric]:>12.3f}"
+                    f"{_change(before_run[metric], after_run[metric]):>10}"
+                )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario and concurrency level")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="print the latency and throughput changes between two saved reports instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as f:
+                reports.append(json.load(f))
+        print(compare_reports(*reports))
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    report = asyncio.run(run_suite(args.base_url, scenarios, concurrency_levels, args.requests, args.seed))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,9 @@ import aiohttp
 import os
 from dotenv import load_dotenv
 import io
-from typing import Optional
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
 import logging
 import asyncio # For FastAPI lifespan integration
 from contextlib import asynccontextmanager # For FastAPI lifespan integration
@@ -48,7 +50,242 @@ DEFAULT_FACET_POINTS = {
 intents = discord.Intents.default()
 intents.message_content = True # Keep if you might add prefix commands later
 
-bot = commands.Bot(command_prefix="!", intents=intents) # Changed: client -> bot, and class to commands.Bot
+# Connection pool / timeout tuning for the shared API client
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "20"))
+API_KEEPALIVE_SECONDS = float(os.getenv("API_KEEPALIVE_SECONDS", "60"))
+API_TIMEOUT_SECONDS = float(os.getenv("API_TIMEOUT_SECONDS", "10"))
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_RETRY_BACKOFF_SECONDS = float(os.getenv("API_RETRY_BACKOFF_SECONDS", "0.5"))
+ETAG_CACHE_SIZE = 256
+
+# Errors a command should report as "could not reach the API" (connection failures and timeouts)
+API_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+class ApiClient:
+    """
+    One long-lived aiohttp session to the Leaderboard API, shared by every command.
+    Connections are kept alive between interactions, connection failures are retried with
+    exponential backoff, and each call's latency is logged per endpoint.
+    """
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.latency: Dict[str, Tuple[int, float]] = {}  # endpoint -> (calls, total ms)
+        # Last successful GET body per URL with its ETag; reads send If-None-Match and reuse it on 304
+        self._etag_cache: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+
+    async def start(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=API_MAX_CONNECTIONS,
+                keepalive_timeout=API_KEEPALIVE_SECONDS,
+                ttl_dns_cache=300,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=API_TIMEOUT_SECONDS),
+            )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _record_latency(self, method: str, endpoint: str, status: int, elapsed_ms: float):
+        key = f"{method} {endpoint}"
+        calls, total_ms = self.latency.get(key, (0, 0.0))
+        calls, total_ms = calls + 1, total_ms + elapsed_ms
+        self.latency[key] = (calls, total_ms)
+        logger.info(f"[API] {key} -> {status} in {elapsed_ms:.1f} ms (avg {total_ms / calls:.1f} ms over {calls} calls)")
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        endpoint: Optional[str] = None,
+        params: Optional[dict] = None,
+        json: Any = None,
+        as_bytes: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, Any]:
+        """
+        Calls the API and returns (status, body). On 200 body is the parsed JSON (raw bytes when
+        as_bytes), otherwise the error text. GETs are revalidated with the cached ETag.
+        endpoint is the label used in latency logs (defaults to path; pass a template for
+        paths that embed user input). ClientConnectorError is re-raised once retries run out.
+        """
+        if self.session is None or self.session.closed:
+            await self.start()
+        url = f"{self.base_url}{path}"
+        cache_key = f"{url}?{sorted(params.items())}" if params else url
+        cached = self._etag_cache.get(cache_key) if method == "GET" else None
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        call_timeout = aiohttp.ClientTimeout(total=timeout) if timeout is not None else None
+
+        for attempt in range(API_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, url, params=params, json=json, headers=headers, timeout=call_timeout) as resp:
+                    if resp.status == 304 and cached:
+                        self._etag_cache.move_to_end(cache_key)
+                        status, body = 200, cached[1]
+                    elif resp.status != 200:
+                        status, body = resp.status, await resp.text()
+                    else:
+                        status = 200
+                        body = await resp.read() if as_bytes else await resp.json()
+                        etag = resp.headers.get("ETag")
+                        if method == "GET" and etag:
+                            self._etag_cache[cache_key] = (etag, body)
+                            self._etag_cache.move_to_end(cache_key)
+                            while len(self._etag_cache) > ETAG_CACHE_SIZE:
+                                self._etag_cache.popitem(last=False)
+                self._record_latency(method, endpoint or path, resp.status, (time.perf_counter() - started) * 1000)
+                return status, body
+            except aiohttp.ClientConnectorError as e:
+                if attempt == API_RETRIES:
+                    raise
+                delay = API_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning(f"[API] {method} {endpoint or path} connection failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def get(self, path: str, **kwargs) -> Tuple[int, Any]:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> Tuple[int, Any]:
+        return await self.request("POST", path, **kwargs)
+
+TEAM_INDEX_TTL_SECONDS = float(os.getenv("TEAM_INDEX_TTL_SECONDS", "300"))
+TEAM_INDEX_NGRAM = 3  # Longest n-gram indexed; longer queries intersect their trigrams
+
+def log_task_failure(task: asyncio.Task):
+    """Done callback for background tasks, whose exceptions would otherwise go unreported until garbage collection."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed", exc_info=task.exception())
+
+def guild_params(interaction: discord.Interaction) -> Dict[str, str]:
+    """Scopes an API call to the server the command came from; DMs fall back to the API's default guild."""
+    return {"guild_id": str(interaction.guild_id)} if interaction.guild_id else {}
+
+class TeamIndex:
+    """
+    In-memory n-gram index of one guild's team names for autocomplete. Every substring of length
+    1..TEAM_INDEX_NGRAM maps to the teams containing it, so a lookup is a dict hit (short
+    queries) or a small set intersection plus a substring check (longer ones).
+    """
+    def __init__(self, params: Optional[Dict[str, str]] = None):
+        self.params = params or {}  # guild_params of the guild this index covers
+        self.teams: List[str] = []
+        self.ngrams: Dict[str, Set[str]] = {}
+        self.loaded = False
+        self.expires_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None  # Held so the event loop can't garbage-collect it mid-run
+
+    def _index(self, team: str):
+        name = team.lower()
+        for n in range(1, TEAM_INDEX_NGRAM + 1):
+            for i in range(len(name) - n + 1):
+                self.ngrams.setdefault(name[i:i + n], set()).add(team)
+
+    def load(self, teams: List[str]):
+        self.teams = sorted(teams)
+        self.ngrams = {}
+        for team in self.teams:
+            self._index(team)
+        self.loaded = True
+        self.expires_at = time.monotonic() + TEAM_INDEX_TTL_SECONDS
+
+    def add(self, team: str):
+        """Makes a just-created team searchable without waiting for the next refresh."""
+        if team not in self.teams:
+            self.teams = sorted(self.teams + [team])
+            self._index(team)
+
+    def invalidate(self):
+        """Marks the index stale; it keeps answering until the next refresh replaces it."""
+        self.expires_at = 0.0
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def search(self, query: str, limit: int = 25) -> List[str]:
+        """Teams containing query (case-insensitive), prefix matches first, then alphabetical."""
+        query = query.lower()
+        if not query:
+            return self.teams[:limit]
+        if len(query) <= TEAM_INDEX_NGRAM:
+            candidates = self.ngrams.get(query, set())
+        else:
+            grams = [query[i:i + TEAM_INDEX_NGRAM] for i in range(len(query) - TEAM_INDEX_NGRAM + 1)]
+            candidates = set.intersection(*(self.ngrams.get(g, set()) for g in grams))
+            candidates = {team for team in candidates if query in team.lower()}
+        return sorted(candidates, key=lambda team: (not team.lower().startswith(query), team))[:limit]
+
+    async def refresh(self, api: "ApiClient"):
+        async with self._refresh_lock:
+            status, body = await api.get("/get_teams", params=self.params)
+            if status == 200:
+                self.load(body)
+            else:
+                logger.error(f"API Error refreshing team index: {status} - {body}")
+
+    def refresh_in_background(self, api: "ApiClient"):
+        """Starts a refresh unless one is running; a failed one is logged and the current list keeps answering."""
+        if self._refresh_lock.locked() or (self._refresh_task is not None and not self._refresh_task.done()):
+            return
+        self._refresh_task = asyncio.create_task(self.refresh(api), name="team-index-refresh")
+        self._refresh_task.add_done_callback(log_task_failure)
+
+class TeamIndexes:
+    """
+    One TeamIndex per guild. A guild's index is created (and loaded) by its first autocomplete, then
+    kept warm by refresh_loop, so servers that never use team commands cost no API calls.
+    """
+    def __init__(self):
+        self._indexes: Dict[str, TeamIndex] = {}
+
+    def for_interaction(self, interaction: discord.Interaction) -> TeamIndex:
+        params = guild_params(interaction)
+        key = params.get("guild_id", "")
+        if key not in self._indexes:
+            self._indexes[key] = TeamIndex(params)
+        return self._indexes[key]
+
+    async def refresh_loop(self, api: "ApiClient"):
+        while True:
+            await asyncio.sleep(TEAM_INDEX_TTL_SECONDS)
+            for index in list(self._indexes.values()):
+                try:
+                    await index.refresh(api)
+                except API_ERRORS as e:
+                    logger.error(f"Connection Error refreshing team index: {e}")
+                except Exception:
+                    # One guild's bad response mustn't stop the refresher for every guild
+                    logger.exception(f"Unexpected error refreshing team index {index.params}")
+
+class LeaderboardBot(commands.Bot):
+    """commands.Bot that owns the shared API client for its whole lifetime."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api = ApiClient(API_BASE_URL)
+        self.team_indexes = TeamIndexes()
+        self.team_index_refresher: Optional[asyncio.Task] = None
+
+    async def setup_hook(self):
+        await self.api.start()
+        # Keeps autocomplete answerable from memory
+        self.team_index_refresher = asyncio.create_task(self.team_indexes.refresh_loop(self.api), name="team-index-refresher")
+        self.team_index_refresher.add_done_callback(log_task_failure)
+
+    async def close(self):
+        if self.team_index_refresher is not None:
+            self.team_index_refresher.cancel()
+        await super().close()
+        await self.api.close()
+
+bot = LeaderboardBot(command_prefix="!", intents=intents) # Changed: client -> bot, and class to commands.Bot
 
 # tree = app_commands.CommandTree(client) # This was the old way, now it's client.tree
 
@@ -89,49 +326,48 @@ async def update_score_for_facet(
     payload = {
         "user_id": str(member), 
         "facet": api_facet_name,
-        "amount": amount_to_add
+        "amount": amount_to_add,
+        **guild_params(interaction)
     }
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(f"{API_BASE_URL}/score", json=payload) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    await interaction.response.send_message(
-                        f"{member.display_name}'s {api_facet_name.replace('_', ' ')} score is now {data['score']}. Points added: {amount_to_add}.",
-                        ephemeral=False
-                    )
-                else:
-                    error_data = await resp.text()
-                    logger.error(f"API Error for {api_facet_name} ({member}): {resp.status} - {error_data}")
-                    await interaction.response.send_message(
-                        f"Failed to update {api_facet_name.replace('_', ' ')} score for {member.display_name}. API Error: {resp.status}", 
-                        ephemeral=True
-                    )
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error updating score for {api_facet_name} ({member}): {e}")
+    try:
+        status, body = await bot.api.post("/score", json=payload)
+        if status == 200:
+            data = body
+            await interaction.response.send_message(
+                f"{member.display_name}'s {api_facet_name.replace('_', ' ')} score is now {data['score']}. Points added: {amount_to_add}.",
+                ephemeral=False
+            )
+        else:
+            error_data = body
+            logger.error(f"API Error for {api_facet_name} ({member}): {status} - {error_data}")
             await interaction.response.send_message(
-                f"Could not connect to the Leaderboard API to update score for {member.display_name}.",
+                f"Failed to update {api_facet_name.replace('_', ' ')} score for {member.display_name}. API Error: {status}", 
                 ephemeral=True
             )
+    except API_ERRORS as e:
+        logger.error(f"Connection Error updating score for {api_facet_name} ({member}): {e}")
+        await interaction.response.send_message(
+            f"Could not connect to the Leaderboard API to update score for {member.display_name}.",
+            ephemeral=True
+        )
 
 @bot.tree.command(name="leaderboard", description="Displays the current leaderboard.") # Changed: client -> bot
 async def leaderboard_slash(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False) 
-    async with aiohttp.ClientSession() as session:
-        discord_leaderboard_url = f"{API_BASE_URL}/leaderboard/discord"
-        try:
-            async with session.get(discord_leaderboard_url) as resp:
-                if resp.status == 200:
-                    image_bytes = await resp.read()
-                    await interaction.followup.send(file=discord.File(io.BytesIO(image_bytes), filename="leaderboard.png"))
-                else:
-                    error_message = await resp.text()
-                    logger.error(f"API Error for /leaderboard/discord: {resp.status} - {error_message}")
-                    await interaction.followup.send(f"Failed to fetch leaderboard image. API Error: {resp.status}", ephemeral=True)
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error fetching leaderboard: {e}")
-            await interaction.followup.send("Could not connect to the Leaderboard API to fetch the leaderboard.", ephemeral=True)
+    discord_leaderboard_url = "/leaderboard/discord"
+    try:
+        status, body = await bot.api.get(discord_leaderboard_url, params=guild_params(interaction), as_bytes=True, timeout=30) # Cold renders can take a while
+        if status == 200:
+            image_bytes = body
+            await interaction.followup.send(file=discord.File(io.BytesIO(image_bytes), filename="leaderboard.png"))
+        else:
+            error_message = body
+            logger.error(f"API Error for /leaderboard/discord: {status} - {error_message}")
+            await interaction.followup.send(f"Failed to fetch leaderboard image. API Error: {status}", ephemeral=True)
+    except API_ERRORS as e:
+        logger.error(f"Connection Error fetching leaderboard: {e}")
+        await interaction.followup.send("Could not connect to the Leaderboard API to fetch the leaderboard.", ephemeral=True)
 
 @bot.tree.command(name="quiet_time", description="Log daily quiet time.") # Changed: client -> bot
 @app_commands.describe(member="The member to credit.", points="Custom points to award (optional).")
@@ -168,91 +404,91 @@ async def check_in_slash(interaction: discord.Interaction, member: discord.Membe
 async def my_score_slash(interaction: discord.Interaction, user: discord.Member):
     await interaction.response.defer(ephemeral=False)
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            # Get user's individual facet scores
-            scores_url = f"{API_BASE_URL}/get_user_scores/{str(user)}"
-            async with session.get(scores_url) as resp:
-                if resp.status == 200:
-                    user_scores = await resp.json()
+    try:
+        # Get user's individual facet scores
+        scores_url = f"/get_user_scores/{str(user)}"
+        status, body = await bot.api.get(scores_url, endpoint="/get_user_scores/{user_id}", params=guild_params(interaction))
+        if status == 200:
+            user_scores = body
                     
-                    # Build formatted message
-                    embed = discord.Embed(
-                        title=f"📊 {user.display_name}'s Scores",
-                        color=0x3498db
-                    )
+            # Build formatted message
+            embed = discord.Embed(
+                title=f"📊 {user.display_name}'s Scores",
+                color=0x3498db
+            )
                     
-                    total_score = 0
-                    for facet_data in user_scores:
-                        facet_name = facet_data['facet'].replace('_', ' ').title()
-                        score = facet_data['score']
-                        total_score += score
-                        embed.add_field(name=facet_name, value=f"{score} points", inline=True)
+            total_score = 0
+            for facet_data in user_scores:
+                facet_name = facet_data['facet'].replace('_', ' ').title()
+                score = facet_data['score']
+                total_score += score
+                embed.add_field(name=facet_name, value=f"{score} points", inline=True)
                     
-                    embed.add_field(name="🏆 Total Score", value=f"{total_score} points", inline=False)
-                    embed.set_thumbnail(url=user.display_avatar.url)
+            embed.add_field(name="🏆 Total Score", value=f"{total_score} points", inline=False)
+            embed.set_thumbnail(url=user.display_avatar.url)
                     
-                    await interaction.followup.send(embed=embed)
-                else:
-                    error_message = await resp.text()
-                    logger.error(f"API Error for /get_user_scores: {resp.status} - {error_message}")
-                    await interaction.followup.send(f"Failed to fetch scores for {user.display_name}. User may not have any scores yet.", ephemeral=True)
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error fetching user scores: {e}")
-            await interaction.followup.send("Could not connect to the Leaderboard API to fetch user scores.", ephemeral=True)
+            await interaction.followup.send(embed=embed)
+        else:
+            error_message = body
+            logger.error(f"API Error for /get_user_scores: {status} - {error_message}")
+            await interaction.followup.send(f"Failed to fetch scores for {user.display_name}. User may not have any scores yet.", ephemeral=True)
+    except API_ERRORS as e:
+        logger.error(f"Connection Error fetching user scores: {e}")
+        await interaction.followup.send("Could not connect to the Leaderboard API to fetch user scores.", ephemeral=True)
 
 async def team_autocomplete(
     interaction: discord.Interaction,
     current: str,
 ) -> list[app_commands.Choice[str]]:
-    """Autocomplete function to fetch available teams."""
-    async with aiohttp.ClientSession() as session:
+    """Autocomplete for team names, answered from the guild's in-memory team index."""
+    team_index = bot.team_indexes.for_interaction(interaction)
+    if not team_index.loaded:
+        # Nothing indexed yet for this guild: load once, within Discord's 3s deadline
         try:
-            async with session.get(f"{API_BASE_URL}/get_teams") as resp:
-                if resp.status == 200:
-                    teams = await resp.json()
-                    # Filter teams based on current input and return up to 25 choices
-                    filtered_teams = [team for team in teams if current.lower() in team.lower()]
-                    return [
-                        app_commands.Choice(name=team, value=team)
-                        for team in filtered_teams[:25]  # Discord limits to 25 choices
-                    ]
-                else:
-                    return []
+            await asyncio.wait_for(team_index.refresh(bot.api), timeout=2)
         except Exception:
             return []
+    elif team_index.stale:
+        team_index.refresh_in_background(bot.api)
+    return [
+        app_commands.Choice(name=team, value=team)
+        for team in team_index.search(current, limit=25)  # Discord limits to 25 choices
+    ]
 
 @bot.tree.command(name="create_team", description="Create a new team.")
 @app_commands.describe(team_name="The name of the team to create.")
 async def create_team_slash(interaction: discord.Interaction, team_name: str):
     await interaction.response.defer(ephemeral=False)
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            payload = {"name": team_name}
-            async with session.post(f"{API_BASE_URL}/create_team", json=payload) as resp:
-                if resp.status == 200:
-                    team_data = await resp.json()
-                    embed = discord.Embed(
-                        title="🎉 Team Created Successfully!",
-                        description=f"Team **{team_data['name']}** has been created.",
-                        color=0x00ff00
-                    )
-                    embed.add_field(name="Team ID", value=team_data['id'], inline=True)
-                    embed.add_field(name="Team Name", value=team_data['name'], inline=True)
-                    await interaction.followup.send(embed=embed)
-                else:
-                    error_message = await resp.text()
-                    logger.error(f"API Error for /create_team: {resp.status} - {error_message}")
+    try:
+        payload = {"name": team_name, **guild_params(interaction)}
+        status, body = await bot.api.post("/create_team", json=payload)
+        if status == 200:
+            team_data = body
+            # Searchable immediately; the stale mark makes the next autocomplete resync the full list
+            team_index = bot.team_indexes.for_interaction(interaction)
+            team_index.add(team_data['name'])
+            team_index.invalidate()
+            embed = discord.Embed(
+                title="🎉 Team Created Successfully!",
+                description=f"Team **{team_data['name']}** has been created.",
+                color=0x00ff00
+            )
+            embed.add_field(name="Team ID", value=team_data['id'], inline=True)
+            embed.add_field(name="Team Name", value=team_data['name'], inline=True)
+            await interaction.followup.send(embed=embed)
+        else:
+            error_message = body
+            logger.error(f"API Error for /create_team: {status} - {error_message}")
                     
-                    # Handle specific error cases
-                    if resp.status == 400:
-                        await interaction.followup.send(f"❌ Team '{team_name}' already exists!", ephemeral=True)
-                    else:
-                        await interaction.followup.send(f"❌ Failed to create team. API Error: {resp.status}", ephemeral=True)
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error creating team: {e}")
-            await interaction.followup.send("❌ Could not connect to the Leaderboard API to create the team.", ephemeral=True)
+            # Handle specific error cases
+            if status == 400:
+                await interaction.followup.send(f"❌ Team '{team_name}' already exists!", ephemeral=True)
+            else:
+                await interaction.followup.send(f"❌ Failed to create team. API Error: {status}", ephemeral=True)
+    except API_ERRORS as e:
+        logger.error(f"Connection Error creating team: {e}")
+        await interaction.followup.send("❌ Could not connect to the Leaderboard API to create the team.", ephemeral=True)
 
 @bot.tree.command(name="add_to_team", description="Add a user to a team.")
 @app_commands.describe(
@@ -263,97 +499,118 @@ async def create_team_slash(interaction: discord.Interaction, team_name: str):
 async def add_to_team_slash(interaction: discord.Interaction, user: discord.Member, team_name: str):
     await interaction.response.defer(ephemeral=False)
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            payload = {
-                "user_name": str(user),
-                "team_name": team_name
-            }
-            async with session.post(f"{API_BASE_URL}/assign_user_to_team", json=payload) as resp:
-                if resp.status == 200:
-                    assignment_data = await resp.json()
-                    embed = discord.Embed(
-                        title="👥 User Added to Team!",
-                        description=f"**{user.display_name}** has been added to team **{assignment_data['team_name']}**.",
-                        color=0x00ff00
-                    )
-                    embed.add_field(name="User", value=assignment_data['user_name'], inline=True)
-                    embed.add_field(name="Team", value=assignment_data['team_name'], inline=True)
-                    embed.set_thumbnail(url=user.display_avatar.url)
-                    await interaction.followup.send(embed=embed)
-                else:
-                    error_message = await resp.text()
-                    logger.error(f"API Error for /assign_user_to_team: {resp.status} - {error_message}")
+    try:
+        payload = {
+            "user_name": str(user),
+            "team_name": team_name,
+            **guild_params(interaction)
+        }
+        status, body = await bot.api.post("/assign_user_to_team", json=payload)
+        if status == 200:
+            assignment_data = body
+            embed = discord.Embed(
+                title="👥 User Added to Team!",
+                description=f"**{user.display_name}** has been added to team **{assignment_data['team_name']}**.",
+                color=0x00ff00
+            )
+            embed.add_field(name="User", value=assignment_data['user_name'], inline=True)
+            embed.add_field(name="Team", value=assignment_data['team_name'], inline=True)
+            embed.set_thumbnail(url=user.display_avatar.url)
+            await interaction.followup.send(embed=embed)
+        else:
+            error_message = body
+            logger.error(f"API Error for /assign_user_to_team: {status} - {error_message}")
                     
-                    # Handle specific error cases
-                    if resp.status == 404:
-                        await interaction.followup.send(f"❌ Team '{team_name}' not found!", ephemeral=True)
-                    else:
-                        await interaction.followup.send(f"❌ Failed to add user to team. API Error: {resp.status}", ephemeral=True)
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error adding user to team: {e}")
-            await interaction.followup.send("❌ Could not connect to the Leaderboard API to add user to team.", ephemeral=True)
+            # Handle specific error cases
+            if status == 404:
+                await interaction.followup.send(f"❌ Team '{team_name}' not found!", ephemeral=True)
+            else:
+                await interaction.followup.send(f"❌ Failed to add user to team. API Error: {status}", ephemeral=True)
+    except API_ERRORS as e:
+        logger.error(f"Connection Error adding user to team: {e}")
+        await interaction.followup.send("❌ Could not connect to the Leaderboard API to add user to team.", ephemeral=True)
 
 @bot.tree.command(name="list_teams", description="List all available teams.")
 async def list_teams_slash(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(f"{API_BASE_URL}/get_teams") as resp:
-                if resp.status == 200:
-                    teams = await resp.json()
+    try:
+        status, body = await bot.api.get("/get_teams", params=guild_params(interaction))
+        if status == 200:
+            teams = body
                     
-                    if not teams:
-                        embed = discord.Embed(
-                            title="📋 Teams List",
-                            description="No teams have been created yet.",
-                            color=0xffa500
-                        )
-                    else:
-                        embed = discord.Embed(
-                            title="📋 Available Teams",
-                            color=0x3498db
-                        )
+            if not teams:
+                embed = discord.Embed(
+                    title="📋 Teams List",
+                    description="No teams have been created yet.",
+                    color=0xffa500
+                )
+            else:
+                embed = discord.Embed(
+                    title="📋 Available Teams",
+                    color=0x3498db
+                )
                         
-                        # Split teams into chunks for better display
-                        team_chunks = [teams[i:i+10] for i in range(0, len(teams), 10)]
+                # Split teams into chunks for better display
+                team_chunks = [teams[i:i+10] for i in range(0, len(teams), 10)]
                         
-                        for i, chunk in enumerate(team_chunks):
-                            field_name = "Teams" if i == 0 else f"Teams (continued {i+1})"
-                            team_list = "\n".join([f"• {team}" for team in chunk])
-                            embed.add_field(name=field_name, value=team_list, inline=False)
+                for i, chunk in enumerate(team_chunks):
+                    field_name = "Teams" if i == 0 else f"Teams (continued {i+1})"
+                    team_list = "\n".join([f"• {team}" for team in chunk])
+                    embed.add_field(name=field_name, value=team_list, inline=False)
                         
-                        embed.set_footer(text=f"Total teams: {len(teams)}")
+                embed.set_footer(text=f"Total teams: {len(teams)}")
                     
-                    await interaction.followup.send(embed=embed)
-                else:
-                    error_message = await resp.text()
-                    logger.error(f"API Error for /get_teams: {resp.status} - {error_message}")
-                    await interaction.followup.send(f"❌ Failed to fetch teams. API Error: {resp.status}", ephemeral=True)
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error fetching teams: {e}")
-            await interaction.followup.send("❌ Could not connect to the Leaderboard API to fetch teams.", ephemeral=True)
+            await interaction.followup.send(embed=embed)
+        else:
+            error_message = body
+            logger.error(f"API Error for /get_teams: {status} - {error_message}")
+            await interaction.followup.send(f"❌ Failed to fetch teams. API Error: {status}", ephemeral=True)
+    except API_ERRORS as e:
+        logger.error(f"Connection Error fetching teams: {e}")
+        await interaction.followup.send("❌ Could not connect to the Leaderboard API to fetch teams.", ephemeral=True)
+
+async def fetch_users_page(guild: Dict[str, str], cursor: Optional[str] = None, limit: int = 20) -> dict:
+    """Fetches one keyset page of a guild's users (guild is guild_params) ranked by total points."""
+    params = {"limit": limit, **guild}
+    if cursor:
+        params["cursor"] = cursor
+    status, body = await bot.api.get("/get_users_with_scores_page", params=params)
+    if status != 200:
+        error_message = body
+        logger.error(f"API Error for /get_users_with_scores_page: {status} - {error_message}")
+        raise RuntimeError(f"API Error: {status}")
+    return body
 
 class UsersPaginationView(discord.ui.View):
-    def __init__(self, users_data, per_page=20):
+    """
+    Pages through all users, fetching each page from the API on button press.
+    Only the current page and the cursors of visited pages are held in memory.
+    """
+    def __init__(self, first_page, guild: Dict[str, str], per_page=20):
         super().__init__(timeout=300)  # 5 minutes timeout
-        self.users_data = users_data
+        self.guild = guild  # guild_params of the server the listing came from
         self.per_page = per_page
         self.current_page = 0
-        self.total_pages = (len(users_data) + per_page - 1) // per_page
+        self.page_cursors = [None]  # Cursor that starts each visited page; index = page number
+        self.apply_page(first_page)
+    
+    def apply_page(self, page_data):
+        self.page_users = page_data["users"]
+        self.total_users = page_data["total_users"]
+        # The API's count can trail its pages briefly (it comes from each worker's in-memory rank index)
+        self.total_pages = max(1, (self.total_users + self.per_page - 1) // self.per_page, self.current_page + 1)
+        next_cursor = page_data["next_cursor"]
+        if next_cursor and len(self.page_cursors) == self.current_page + 1:
+            self.page_cursors.append(next_cursor)
         
-        # Disable buttons if only one page
-        if self.total_pages <= 1:
-            self.previous_button.disabled = True
-            self.next_button.disabled = True
-        else:
-            self.previous_button.disabled = True  # Start with previous disabled
+        # Update button states (the API only returns next_cursor when another row exists)
+        self.previous_button.disabled = self.current_page == 0
+        self.next_button.disabled = next_cursor is None
     
     def get_embed(self):
         start_idx = self.current_page * self.per_page
-        end_idx = start_idx + self.per_page
-        page_users = self.users_data[start_idx:end_idx]
+        page_users = self.page_users
         
         embed = discord.Embed(
             title="👥 All Users Leaderboard",
@@ -403,34 +660,34 @@ class UsersPaginationView(discord.ui.View):
                 field_name = "Rankings" if i == 0 else f"Rankings (continued {i+1})"
                 embed.add_field(name=field_name, value=chunk, inline=False)
         else:
-            embed.add_field(name="Rankings", value=leaderboard_text, inline=False)
+            # Discord rejects empty field values; a page can still come back empty if users left since the last one
+            embed.add_field(name="Rankings", value=leaderboard_text or "No users on this page.", inline=False)
         
         # Add footer with pagination info
-        embed.set_footer(text=f"Page {self.current_page + 1} of {self.total_pages} • Total users: {len(self.users_data)}")
+        embed.set_footer(text=f"Page {self.current_page + 1} of {self.total_pages} • Total users: {self.total_users}")
         
         return embed
     
-    @discord.ui.button(label="◀️ Previous", style=discord.ButtonStyle.primary)
-    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_page -= 1
-        
-        # Update button states
-        self.previous_button.disabled = self.current_page == 0
-        self.next_button.disabled = False
+    async def show_page(self, interaction: discord.Interaction, page_number: int):
+        try:
+            page_data = await fetch_users_page(self.guild, self.page_cursors[page_number], self.per_page)
+        except (RuntimeError, *API_ERRORS) as e:
+            logger.error(f"Error fetching users page {page_number + 1}: {e}")
+            await interaction.response.send_message("❌ Could not fetch that page from the Leaderboard API.", ephemeral=True)
+            return
         
+        self.current_page = page_number
+        self.apply_page(page_data)
         embed = self.get_embed()
         await interaction.response.edit_message(embed=embed, view=self)
     
+    @discord.ui.button(label="◀️ Previous", style=discord.ButtonStyle.primary)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.current_page - 1)
+    
     @discord.ui.button(label="Next ▶️", style=discord.ButtonStyle.primary)
     async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_page += 1
-        
-        # Update button states
-        self.next_button.disabled = self.current_page == self.total_pages - 1
-        self.previous_button.disabled = False
-        
-        embed = self.get_embed()
-        await interaction.response.edit_message(embed=embed, view=self)
+        await self.show_page(interaction, self.current_page + 1)
     
     async def on_timeout(self):
         # Disable all buttons when the view times out
@@ -441,33 +698,31 @@ class UsersPaginationView(discord.ui.View):
 async def all_users_slash(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(f"{API_BASE_URL}/get_all_users_with_scores") as resp:
-                if resp.status == 200:
-                    users_data = await resp.json()
-                    
-                    if not users_data:
-                        embed = discord.Embed(
-                            title="👥 All Users",
-                            description="No users with scores found.",
-                            color=0xffa500
-                        )
-                        await interaction.followup.send(embed=embed)
-                        return
-                    
-                    # Create pagination view
-                    view = UsersPaginationView(users_data)
-                    embed = view.get_embed()
-                    
-                    await interaction.followup.send(embed=embed, view=view)
-                else:
-                    error_message = await resp.text()
-                    logger.error(f"API Error for /get_all_users_with_scores: {resp.status} - {error_message}")
-                    await interaction.followup.send(f"❌ Failed to fetch user scores. API Error: {resp.status}", ephemeral=True)
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error fetching all users: {e}")
-            await interaction.followup.send("❌ Could not connect to the Leaderboard API to fetch user data.", ephemeral=True)
+    try:
+        # Only the first page is fetched up front; the view fetches the rest on demand
+        first_page = await fetch_users_page(guild_params(interaction))
+    except RuntimeError as e:
+        await interaction.followup.send(f"❌ Failed to fetch user scores. {e}", ephemeral=True)
+        return
+    except API_ERRORS as e:
+        logger.error(f"Connection Error fetching all users: {e}")
+        await interaction.followup.send("❌ Could not connect to the Leaderboard API to fetch user data.", ephemeral=True)
+        return
+    
+    if not first_page["users"]:
+        embed = discord.Embed(
+            title="👥 All Users",
+            description="No users with scores found.",
+            color=0xffa500
+        )
+        await interaction.followup.send(embed=embed)
+        return
+    
+    # Create pagination view
+    view = UsersPaginationView(first_page, guild_params(interaction))
+    embed = view.get_embed()
+    
+    await interaction.followup.send(embed=embed, view=view)
 
 @bot.tree.command(name="my_team", description="Show team's total scores for all facets.")
 @app_commands.describe(team_name="The team to check scores for.")
@@ -475,43 +730,42 @@ async def all_users_slash(interaction: discord.Interaction):
 async def my_team_slash(interaction: discord.Interaction, team_name: str):
     await interaction.response.defer(ephemeral=False)
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            # Get team's aggregated scores
-            team_url = f"{API_BASE_URL}/get_team_scores/{team_name}"
-            async with session.get(team_url) as resp:
-                if resp.status == 200:
-                    team_data = await resp.json()
+    try:
+        # Get team's aggregated scores
+        team_url = f"/get_team_scores/{team_name}"
+        status, body = await bot.api.get(team_url, endpoint="/get_team_scores/{team_name}", params=guild_params(interaction))
+        if status == 200:
+            team_data = body
                     
-                    # Build formatted message
-                    embed = discord.Embed(
-                        title=f"🏆 Team {team_name} Scores",
-                        color=0xe74c3c
-                    )
+            # Build formatted message
+            embed = discord.Embed(
+                title=f"🏆 Team {team_name} Scores",
+                color=0xe74c3c
+            )
                     
-                    total_score = team_data.get('total_score', 0)
-                    facet_scores = team_data.get('facet_scores', {})
-                    members = team_data.get('members', [])
+            total_score = team_data.get('total_score', 0)
+            facet_scores = team_data.get('facet_scores', {})
+            members = team_data.get('members', [])
                     
-                    # Add facet scores
-                    for facet, score in facet_scores.items():
-                        facet_name = facet.replace('_', ' ').title()
-                        embed.add_field(name=facet_name, value=f"{score} points", inline=True)
+            # Add facet scores
+            for facet, score in facet_scores.items():
+                facet_name = facet.replace('_', ' ').title()
+                embed.add_field(name=facet_name, value=f"{score} points", inline=True)
                     
-                    embed.add_field(name="🏆 Total Team Score", value=f"{total_score} points", inline=False)
+            embed.add_field(name="🏆 Total Team Score", value=f"{total_score} points", inline=False)
                     
-                    if members:
-                        member_list = ", ".join(members)
-                        embed.add_field(name="👥 Team Members", value=member_list, inline=False)
+            if members:
+                member_list = ", ".join(members)
+                embed.add_field(name="👥 Team Members", value=member_list, inline=False)
                     
-                    await interaction.followup.send(embed=embed)
-                else:
-                    error_message = await resp.text()
-                    logger.error(f"API Error for /get_team_scores: {resp.status} - {error_message}")
-                    await interaction.followup.send(f"Failed to fetch scores for team '{team_name}'. Team may not exist or have no scores.", ephemeral=True)
-        except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection Error fetching team scores: {e}")
-            await interaction.followup.send("Could not connect to the Leaderboard API to fetch team scores.", ephemeral=True)
+            await interaction.followup.send(embed=embed)
+        else:
+            error_message = body
+            logger.error(f"API Error for /get_team_scores: {status} - {error_message}")
+            await interaction.followup.send(f"Failed to fetch scores for team '{team_name}'. Team may not exist or have no scores.", ephemeral=True)
+    except API_ERRORS as e:
+        logger.error(f"Connection Error fetching team scores: {e}")
+        await interaction.followup.send("Could not connect to the Leaderboard API to fetch team scores.", ephemeral=True)
 
 # --- FastAPI Lifespan Integration (Optional) ---
 # This part is for running the bot alongside a FastAPI server in the same process.
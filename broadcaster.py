@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Set
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+
+
+class Broadcaster:
+    """
+    In-process fan-out of leaderboard deltas to the stream clients of each topic (a guild's board).
+    Each event is serialized once and pushed onto a bounded queue per subscriber;
+    a subscriber that falls behind gets its backlog replaced by a single "resync" event.
+    """
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set["asyncio.Queue[str]"]] = {}
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._subscribers
+
+    @property
+    def topics(self) -> List[str]:
+        return list(self._subscribers)
+
+    def __len__(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, topic: str) -> "asyncio.Queue[str]":
+        queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, topic: str, queue: "asyncio.Queue[str]"):
+        queues = self._subscribers.get(topic)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[topic]
+
+    def publish(self, topic: str, event: str, data: Dict[str, Any]):
+        """Queues an SSE message for every subscriber to topic. Never blocks the writer."""
+        queues = self._subscribers.get(topic)
+        if not queues:
+            return
+        message = format_sse(event, data)
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow to keep up: drop what it hasn't read and tell it to reload instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(format_sse("resync", {}))
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# Shared broadcaster: database.py publishes after each committed write, routes.py streams it
+broadcaster = Broadcaster()
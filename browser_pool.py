@@ -0,0 +1,189 @@
+import asyncio
+import os
+from typing import TYPE_CHECKING, List, Optional
+
+from metrics import time_render_stage
+
+if TYPE_CHECKING:
+    # Playwright itself is imported in start(), so processes that never launch a browser don't load it
+    from playwright.async_api import Browser, BrowserContext, CDPSession, Page, Playwright
+
+# Pool tuning, overridable per container
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_RENDERS = int(os.getenv("BROWSER_MAX_RENDERS", "200")) # Recycle a page after this many screenshots
+BROWSER_MAX_MEMORY_MB = int(os.getenv("BROWSER_MAX_MEMORY_MB", "256")) # Recycle a page once its JS heap grows past this
+BROWSER_HEALTH_INTERVAL = int(os.getenv("BROWSER_HEALTH_INTERVAL", "60")) # Seconds between idle health checks
+BROWSER_LAUNCH_ARGS = ["--no-sandbox", "--disable-setuid-sandbox"] # Common for Docker
+
+
+class PooledPage:
+    """A warm browser context with a single page and the bookkeeping needed to recycle it."""
+
+    def __init__(self, context: "BrowserContext", page: "Page", cdp: "CDPSession"):
+        self.context = context
+        self.page = page
+        self.cdp = cdp
+        self.renders = 0
+
+    async def memory_mb(self) -> float:
+        """JS heap size of the page in MB, as reported by Chromium's performance metrics."""
+        metrics = await self.cdp.send("Performance.getMetrics")
+        heap = next((m["value"] for m in metrics["metrics"] if m["name"] == "JSHeapTotalSize"), 0)
+        return heap / (1024 * 1024)
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception as e:
+            print(f"[BROWSER] Error closing context: {e}")
+
+
+class BrowserPool:
+    """
+    Keeps one Chromium process and N warm contexts/pages ready for screenshots,
+    so a render only costs navigation plus screenshot instead of a browser launch.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_renders: int = BROWSER_MAX_RENDERS,
+                 max_memory_mb: int = BROWSER_MAX_MEMORY_MB, health_interval: int = BROWSER_HEALTH_INTERVAL):
+        self.size = size
+        self.max_renders = max_renders
+        self.max_memory_mb = max_memory_mb
+        self.health_interval = health_interval
+        self._playwright: Optional["Playwright"] = None
+        self._browser: Optional["Browser"] = None
+        self._idle: "asyncio.Queue[PooledPage]" = asyncio.Queue()
+        self._slots: List[PooledPage] = []
+        self._lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None
+
+    async def start(self):
+        """Launches Chromium and warms up the pool. Safe to call more than once."""
+        async with self._lock:
+            if self.started:
+                return
+            from playwright.async_api import async_playwright
+
+            print(f"[BROWSER] Launching Chromium with {self.size} warm pages...")
+            self._playwright = await async_playwright().start()
+            await self._launch_browser()
+            for _ in range(self.size):
+                slot = await self._new_slot()
+                self._idle.put_nowait(slot)
+            self._health_task = asyncio.create_task(self._health_loop())
+            print("[BROWSER] Browser pool ready.")
+
+    async def stop(self):
+        """Closes every page, the browser and the Playwright driver."""
+        async with self._lock:
+            if self._health_task:
+                self._health_task.cancel()
+                self._health_task = None
+            for slot in list(self._slots):
+                await slot.close()
+            self._slots.clear()
+            self._idle = asyncio.Queue()
+            if self._browser:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    print(f"[BROWSER] Error closing browser: {e}")
+                self._browser = None
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+            print("[BROWSER] Browser pool stopped.")
+
+    async def render(self, url: str, selector: str = "table.leaderboard-table", timeout_ms: int = 15000) -> bytes:
+        """Navigates a warm page to url and returns a full-page PNG screenshot."""
+        if not self.started:
+            await self.start()
+
+        with time_render_stage("acquire"):
+            slot = await self._idle.get()
+        healthy = True
+        try:
+            with time_render_stage("goto"):
+                await slot.page.goto(url, wait_until="networkidle")
+                # Wait for a specific element that indicates the leaderboard is loaded.
+                await slot.page.wait_for_selector(selector, timeout=timeout_ms)
+            with time_render_stage("screenshot"):
+                screenshot_bytes = await slot.page.screenshot(type="png", full_page=True)
+            slot.renders += 1
+            return screenshot_bytes
+        except Exception:
+            healthy = False # The page may be wedged mid-navigation; don't hand it out again
+            raise
+        finally:
+            await self._release(slot, healthy)
+
+    async def _launch_browser(self):
+        assert self._playwright is not None
+        with time_render_stage("launch"):
+            self._browser = await self._playwright.chromium.launch(args=BROWSER_LAUNCH_ARGS)
+
+    async def _new_slot(self) -> PooledPage:
+        if not self._browser or not self._browser.is_connected():
+            print("[BROWSER] Browser disconnected, relaunching...")
+            await self._launch_browser()
+        assert self._browser is not None
+        context = await self._browser.new_context()
+        page = await context.new_page()
+        cdp = await context.new_cdp_session(page)
+        await cdp.send("Performance.enable")
+        slot = PooledPage(context, page, cdp)
+        self._slots.append(slot)
+        return slot
+
+    async def _recycle(self, slot: PooledPage) -> PooledPage:
+        if slot in self._slots:
+            self._slots.remove(slot)
+        await slot.close()
+        return await self._new_slot()
+
+    async def _needs_recycle(self, slot: PooledPage) -> bool:
+        if slot.page.is_closed() or slot.renders >= self.max_renders:
+            return True
+        try:
+            return await slot.memory_mb() > self.max_memory_mb
+        except Exception:
+            return True
+
+    async def _release(self, slot: PooledPage, healthy: bool):
+        try:
+            if not healthy or await self._needs_recycle(slot):
+                slot = await self._recycle(slot)
+        except Exception as e:
+            # Keep the pool at full size even if the replacement failed; the health loop retries it
+            print(f"[BROWSER] Failed to recycle page: {e}")
+        self._idle.put_nowait(slot)
+
+    async def _is_healthy(self, slot: PooledPage) -> bool:
+        if slot.page.is_closed() or not self._browser or not self._browser.is_connected():
+            return False
+        try:
+            return await asyncio.wait_for(slot.page.evaluate("1 + 1"), timeout=5) == 2
+        except Exception:
+            return False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            # Only idle pages are checked, so in-flight renders are never interrupted
+            for _ in range(self._idle.qsize()):
+                slot = self._idle.get_nowait()
+                try:
+                    if not await self._is_healthy(slot):
+                        print("[BROWSER] Unhealthy page found, recycling.")
+                        slot = await self._recycle(slot)
+                except Exception as e:
+                    print(f"[BROWSER] Health check failed: {e}")
+                self._idle.put_nowait(slot)
+
+
+# Shared in-process pool, started by main.lifespan when RENDER_WORKERS=0 (render_worker.py runs its own per worker)
+browser_pool = BrowserPool()
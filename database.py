@@ -1,131 +1,719 @@
 # === database.py ===
-from sqlalchemy.orm import Session
-from sqlalchemy import func # for SUM and other SQL functions
-from models import SessionLocal, Leaderboard, ScoreUpdate, Team, User # Changed from .models
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy import select, delete, func, case, and_, or_ # for SUM and other SQL functions
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
+from models import AsyncSessionLocal, ReadSessionLocal, Leaderboard, ScoreItem, ScoreUpdate, Team, User, UserTotal, TeamTotal, ScoreEvent, ScoreRollup, DataVersion, ROLLUP_PERIODS, DEFAULT_GUILD_ID, GLOBAL_VERSION_KEY # Changed from .models
 from typing import List, Dict, Tuple, Optional, Any # Import Any
+from rank_index import rank_indexes
+from broadcaster import broadcaster
+import json
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
 
+# This worker's copy of the leaderboard data versions (models.DataVersion). Every committed write bumps a
+# version row in its own transaction, so caches keyed on the versions (e.g. rendered leaderboard images)
+# never serve data older than the DB, and every worker derives the same ETags. A write to one guild only
+# bumps that guild's row, leaving other guilds' caches and ETags valid; rebuilds that touch every guild
+# bump the global one. A guild's version is the sum of both. Copies only move forward, whichever of
+# this worker's commits and other workers' notifications arrives first.
+_data_version = 0
+_guild_versions: Dict[str, int] = {}
+# Marks this worker's own notifications, which it has already applied
+_worker_id = uuid.uuid4().hex[:8]
+# Reads stay on the primary for this long after a write commits here or another worker's write is adopted.
+# That gives read-your-writes (e.g. a board fetched right after /score), and stops a lagging replica from
+# serving, caching or ETag-ing pre-write data under the new data version. Should exceed the replica's usual lag.
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "2"))
+_last_write_at = float("-inf")
 
-# Dependency to get a DB session
-def get_db():
-    db = SessionLocal()
-    try:
+# Cross-worker invalidation (PostgreSQL only): writes NOTIFY this channel inside their transaction, and every
+# worker's listener (invalidation.py) applies them to its copy of the data versions, its rank index and its stream
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "leaderboard_changes")
+NOTIFY_PAYLOAD_LIMIT = 7900 # PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+
+def get_data_version(guild_id: str = DEFAULT_GUILD_ID) -> int:
+    return _data_version + _guild_versions.get(guild_id, 0)
+
+def get_data_etag(window: str = "all", guild_id: str = DEFAULT_GUILD_ID) -> str:
+    """
+    Weak ETag for any response derived from a guild's current leaderboard data. Windowed boards also
+    change when a new bucket starts, so their tag includes the current bucket.
+    """
+    version = get_data_version(guild_id)
+    if window in ROLLUP_PERIODS:
+        return f'W/"{version}-{window}-{bucket_start(window).isoformat()}"'
+    return f'W/"{version}"'
+
+async def _bump_data_version(db: AsyncSession, guild_id: Optional[str] = None) -> int:
+    """
+    Increments the guild's version row (the global one when guild_id is None) in the caller's transaction
+    and returns the new value. The row stays locked until commit, so versions are handed out in commit order.
+    """
+    stmt = _insert(db, DataVersion).values(guild_id=GLOBAL_VERSION_KEY if guild_id is None else guild_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DataVersion.guild_id], set_={"version": DataVersion.version + 1}
+    ).returning(DataVersion.version)
+    return (await db.execute(stmt)).scalar_one()
+
+def _adopt_data_version(guild_id: Optional[str], version: int):
+    """Moves this worker's copy of the guild's (or the global) version up to a committed version."""
+    global _data_version
+    if guild_id is None:
+        _data_version = max(_data_version, version)
+    else:
+        _guild_versions[guild_id] = max(_guild_versions.get(guild_id, 0), version)
+
+def _note_write():
+    """Keeps reads on the primary for READ_AFTER_WRITE_SECONDS, until replicas have caught up with a write."""
+    global _last_write_at
+    _last_write_at = time.monotonic()
+
+def _committed(guild_id: Optional[str], version: int):
+    """Applies a version committed by this worker or, via a notification, by another one."""
+    _adopt_data_version(guild_id, version)
+    _note_write()
+
+async def load_data_versions(db: AsyncSession):
+    """Copies every stored version into this worker (at startup, and when it may have missed notifications)."""
+    for guild_id, version in (await db.execute(select(DataVersion.guild_id, DataVersion.version))).all():
+        _adopt_data_version(None if guild_id == GLOBAL_VERSION_KEY else guild_id, version)
+
+def bucket_start(period: str, when: Optional[datetime] = None) -> date:
+    """First UTC day of the day/week/month bucket containing when (default: now). Weeks start on Monday."""
+    day = (when or datetime.now(timezone.utc)).astimezone(timezone.utc).date()
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+# Dependencies to get an async DB session, so route handlers never block the event loop on DB I/O
+async def get_write_db():
+    """Session on the primary, for routes that write."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def read_session_factory():
+    """The replica's sessionmaker (the primary's when none is configured), or the primary's right after a write."""
+    if time.monotonic() - _last_write_at < READ_AFTER_WRITE_SECONDS:
+        return AsyncSessionLocal
+    return ReadSessionLocal
+
+async def get_read_db():
+    """Session for read-only routes: the read replica if configured, except right after a write."""
+    async with read_session_factory()() as db:
         yield db
-    finally:
-        db.close()
 
 
-def add_score(db: Session, score_update: ScoreUpdate) -> Leaderboard:
-    # Check if a record already exists for this user_id and facet
-    db_score = db.query(Leaderboard).filter(
-        Leaderboard.user_id == score_update.user_id, 
-        Leaderboard.facet == score_update.facet
-    ).first()
+def _insert(db: AsyncSession, model):
+    """Dialect-specific INSERT so writes can use ON CONFLICT (PostgreSQL, or SQLite for local runs)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(model)
+    return pg_insert(model)
+
+
+async def _increment_totals(db: AsyncSession, guild_id: str, amounts: Dict[str, int]) -> Tuple[Dict[str, int], Dict[str, str]]:
+    """
+    Adds per-user amounts to the guild's user totals and to their current teams' totals,
+    inside the caller's transaction. Returns each user's new total and each member's team name.
+    """
+    stmt = _insert(db, UserTotal).values([
+        {"guild_id": guild_id, "user_id": user_id, "total_score": amount} for user_id, amount in sorted(amounts.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserTotal.guild_id, UserTotal.user_id],
+        set_={"total_score": UserTotal.total_score + stmt.excluded.total_score}
+    ).returning(UserTotal.user_id, UserTotal.total_score)
+    user_totals = {row.user_id: row.total_score for row in (await db.execute(stmt)).all()}
+
+    team_amounts: Dict[int, int] = {}
+    user_teams: Dict[str, str] = {}
+    # Locks the users (with a team or not) until commit, as add_user_to_team does: a concurrent team move then
+    # either sees these amounts in the user totals it moves or has already committed the new team read here
+    memberships = await db.execute(
+        select(User.name, User.group_id, Team.name).outerjoin(Team, Team.id == User.group_id)
+        .where(User.guild_id == guild_id, User.name.in_(list(amounts)))
+        .order_by(User.name).with_for_update(of=User)
+    )
+    for user_name, team_id, team_name in memberships.all():
+        if team_id is None:
+            continue
+        team_amounts[team_id] = team_amounts.get(team_id, 0) + amounts[user_name]
+        user_teams[user_name] = team_name
+    await _increment_team_totals(db, guild_id, team_amounts)
+    return user_totals, user_teams
+
+async def _increment_team_totals(db: AsyncSession, guild_id: str, team_amounts: Dict[int, int]):
+    team_amounts = {team_id: amount for team_id, amount in team_amounts.items() if amount}
+    if not team_amounts:
+        return
+    # Rows are locked in team id order, so concurrent moves and score writes can't deadlock on each other's teams
+    stmt = _insert(db, TeamTotal).values([
+        {"team_id": team_id, "guild_id": guild_id, "total_score": amount}
+        for team_id, amount in sorted(team_amounts.items())
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[TeamTotal.team_id],
+        set_={"total_score": TeamTotal.total_score + stmt.excluded.total_score}
+    ))
+
+
+async def _record_events(db: AsyncSession, guild_id: str, awards: List[Tuple[str, str, int]]):
+    """
+    Appends one ledger row per (user_id, facet, amount) award and adds the amounts to the guild's
+    current day/week/month rollup buckets, inside the caller's transaction.
+    """
+    now = datetime.now(timezone.utc)
+    await db.execute(_insert(db, ScoreEvent).values([
+        {"guild_id": guild_id, "user_id": user_id, "facet": facet, "amount": amount, "created_at": now}
+        for user_id, facet, amount in awards
+    ]))
 
-    if db_score:
-        # If exists, add the new amount to the existing score
-        db_score.score = db_score.score + score_update.amount  # type: ignore[reportAttributeAccessIssue]
+    bucket_amounts: Dict[Tuple[str, date, str, str], int] = {}
+    for period in ROLLUP_PERIODS:
+        start = bucket_start(period, now)
+        for user_id, facet, amount in awards:
+            key = (period, start, user_id, facet)
+            bucket_amounts[key] = bucket_amounts.get(key, 0) + amount
+    stmt = _insert(db, ScoreRollup).values([
+        {"guild_id": guild_id, "period": period, "bucket_start": start, "user_id": user_id, "facet": facet, "score": amount}
+        for (period, start, user_id, facet), amount in sorted(bucket_amounts.items())
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[ScoreRollup.guild_id, ScoreRollup.period, ScoreRollup.bucket_start, ScoreRollup.user_id, ScoreRollup.facet],
+        set_={"score": ScoreRollup.score + stmt.excluded.score}
+    ))
+
+
+def _update_rank_index(guild_id: str, user_totals: Dict[str, int]):
+    """Applies committed user totals to the guild's in-process rank index."""
+    rank_index = rank_indexes[guild_id]
+    for user_id, total_score in user_totals.items():
+        rank_index.set_score(user_id, total_score)
+
+
+async def _team_medal_rows(db: AsyncSession, guild_id: str, max_rank: int = 3) -> List[Dict[str, Any]]:
+    """The guild's teams whose dense rank is <= max_rank, i.e. every team holding one of the top distinct totals."""
+    top_totals = select(TeamTotal.total_score).where(TeamTotal.guild_id == guild_id).distinct()\
+        .order_by(TeamTotal.total_score.desc()).limit(max_rank).scalar_subquery()
+    rows = (await db.execute(
+        select(Team.name, TeamTotal.total_score).join(Team, Team.id == TeamTotal.team_id)
+        .where(TeamTotal.guild_id == guild_id, TeamTotal.total_score.in_(top_totals))
+        .order_by(TeamTotal.total_score.desc(), Team.name)
+    )).all()
+    return [{"team_name": row.name, "total_score": row.total_score} for row in rows]
+
+def _changed_users(score_rows: List[Row], user_totals: Dict[str, int], user_teams: Dict[str, str]) -> List[Dict[str, Any]]:
+    """The users touched by a score write with their new totals, teams and changed facet scores."""
+    users: Dict[str, Dict[str, Any]] = {}
+    for row in score_rows:
+        user = users.setdefault(row.user_id, {
+            "user_id": row.user_id,
+            "total_score": user_totals[row.user_id],
+            "team_name": user_teams.get(row.user_id),
+            "facets": {},
+        })
+        user["facets"][row.facet] = row.score
+    return list(users.values())
+
+def _publish_scores(guild_id: str, users: List[Dict[str, Any]], team_medals: Optional[List[Dict[str, Any]]]):
+    """
+    Streams a committed score write to the guild's subscribers as a compact delta: the changed users'
+    totals, ranks and facet scores, the current user medal set from the rank index and the team medal table.
+    """
+    if not broadcaster.has_subscribers(guild_id):
+        return
+    rank_index = rank_indexes.get(guild_id)
+    broadcaster.publish(guild_id, "scores", {
+        "etag": get_data_etag(guild_id=guild_id),
+        "users": [{**user, "rank": rank_index.dense_rank_of_score(user["total_score"])} for user in users],
+        "top": rank_index.top(3),
+        "teams": team_medals,
+    })
+
+def _publish_resync():
+    """Tells every guild's subscribers to reload, after a change that touched all guilds."""
+    for guild_id in broadcaster.topics:
+        broadcaster.publish(guild_id, "resync", {"etag": get_data_etag(guild_id=guild_id)})
+
+async def _notify_change(db: AsyncSession, kind: str, version: int, guild_id: Optional[str] = None, **change: Any):
+    """
+    Queues a NOTIFY describing this write in the current transaction, so other workers only hear about it
+    once it commits (and never if it rolls back). kind is "scores", "team_assignment", "teams" (all for
+    guild_id) or "reload" (every guild); version is what the write bumped guild_id's version row (the global
+    row for "reload") to. A change too large for one payload is sent as "reload".
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    header = {"origin": _worker_id, "version": version}
+    payload = json.dumps({**header, "kind": kind, "guild_id": guild_id, **change})
+    if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+        payload = json.dumps({"origin": _worker_id, "kind": "reload"})
+    await db.execute(select(func.pg_notify(INVALIDATION_CHANNEL, payload)))
+
+async def apply_remote_change(change: Dict[str, Any]):
+    """
+    Applies a write committed by another worker (see _notify_change) to this one: adopts the version it
+    committed (new ETags; the image and fragment caches miss), updates the rank index and relays the change
+    to this worker's stream subscribers. Reads then stay on the primary for a while, as after a local write,
+    since a replica may not have the change yet. Notifications from this worker are ignored.
+    """
+    if change.get("origin") == _worker_id:
+        return
+    kind = change.get("kind")
+    guild_id = change.get("guild_id")
+    version = change.get("version")
+    if kind == "scores" and guild_id and version:
+        _committed(guild_id, version)
+        users = change["users"]
+        _update_rank_index(guild_id, {user["user_id"]: user["total_score"] for user in users})
+        if broadcaster.has_subscribers(guild_id):
+            async with AsyncSessionLocal() as db:
+                team_medals = await _team_medal_rows(db, guild_id)
+            _publish_scores(guild_id, users, team_medals)
+    elif kind == "team_assignment" and guild_id and version:
+        _committed(guild_id, version)
+        if broadcaster.has_subscribers(guild_id):
+            async with AsyncSessionLocal() as db:
+                team_medals = await _team_medal_rows(db, guild_id)
+            broadcaster.publish(guild_id, "team_assignment", {
+                "etag": get_data_etag(guild_id=guild_id),
+                "user_id": change["user_id"],
+                "team_name": change["team_name"],
+                "teams": team_medals,
+            })
+    elif kind == "teams" and guild_id and version:
+        _committed(guild_id, version)
     else:
-        # If not exists, create a new record
-        db_score = Leaderboard(
-            user_id=score_update.user_id, 
-            facet=score_update.facet, 
-            score=score_update.amount
-        )
-        db.add(db_score)
-    
-    db.commit()
-    db.refresh(db_score)
+        # "reload" (or anything unrecognised): start every guild over from the database
+        async with AsyncSessionLocal() as db:
+            await load_data_versions(db)
+            rank_indexes.load(await get_user_totals(db))
+        _note_write()
+        _publish_resync()
+
+
+async def add_score(db: AsyncSession, score_update: ScoreUpdate) -> Row:
+    """
+    Adds amount to the user's running total for the facet in the update's guild, in one transaction:
+    the user is created if missing, then a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+    increments the score atomically, so concurrent calls can't lose updates.
+    Returns a row with user_id, facet, score and last_updated.
+    """
+    guild_id = score_update.guild_id
+    await db.execute(
+        _insert(db, User).values(guild_id=guild_id, name=score_update.user_id)
+        .on_conflict_do_nothing(index_elements=[User.guild_id, User.name])
+    )
+
+    stmt = _insert(db, Leaderboard).values(
+        guild_id=guild_id,
+        user_id=score_update.user_id,
+        facet=score_update.facet,
+        score=score_update.amount,
+        last_updated=func.now()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Leaderboard.guild_id, Leaderboard.user_id, Leaderboard.facet],
+        set_={"score": Leaderboard.score + stmt.excluded.score, "last_updated": func.now()}
+    ).returning(Leaderboard.user_id, Leaderboard.facet, Leaderboard.score, Leaderboard.last_updated)
+    db_score = (await db.execute(stmt)).one()
+    user_totals, user_teams = await _increment_totals(db, guild_id, {score_update.user_id: score_update.amount})
+    await _record_events(db, guild_id, [(score_update.user_id, score_update.facet, score_update.amount)])
+    users = _changed_users([db_score], user_totals, user_teams)
+    version = await _bump_data_version(db, guild_id)
+    await _notify_change(db, "scores", version, guild_id, users=users)
+    # Read in the same transaction so the streamed team table matches this write
+    team_medals = await _team_medal_rows(db, guild_id) if broadcaster.has_subscribers(guild_id) else None
+
+    await db.commit()
+    _committed(guild_id, version)
+    _update_rank_index(guild_id, user_totals)
+    _publish_scores(guild_id, users, team_medals)
     return db_score
 
-def get_user_score_for_facet(db: Session, user_id: str, facet: str) -> int:
-    db_score = db.query(Leaderboard.score).filter(
-        Leaderboard.user_id == user_id, 
-        Leaderboard.facet == facet
-    ).first()
-    return db_score[0] if db_score else 0
+async def add_scores(db: AsyncSession, guild_id: str, score_updates: List[ScoreItem]) -> Dict[Tuple[str, str], Row]:
+    """
+    Applies many score updates to one guild in one transaction with a single multi-row upsert.
+    Amounts for the same (user_id, facet) are summed first, since one statement can't update a row twice.
+    Returns the resulting row for each (user_id, facet) pair.
+    """
+    amounts: Dict[Tuple[str, str], int] = {}
+    for update in score_updates:
+        key = (update.user_id, update.facet)
+        amounts[key] = amounts.get(key, 0) + update.amount
+
+    # Every multi-row write below goes in conflict key order, so concurrent batches sharing users lock their
+    # rows in the same order instead of deadlocking
+    user_names = sorted({user_id for user_id, _ in amounts})
+    await db.execute(
+        _insert(db, User).values([{"guild_id": guild_id, "name": name} for name in user_names])
+        .on_conflict_do_nothing(index_elements=[User.guild_id, User.name])
+    )
+
+    stmt = _insert(db, Leaderboard).values([
+        {"guild_id": guild_id, "user_id": user_id, "facet": facet, "score": amount, "last_updated": func.now()}
+        for (user_id, facet), amount in sorted(amounts.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Leaderboard.guild_id, Leaderboard.user_id, Leaderboard.facet],
+        set_={"score": Leaderboard.score + stmt.excluded.score, "last_updated": func.now()}
+    ).returning(Leaderboard.user_id, Leaderboard.facet, Leaderboard.score, Leaderboard.last_updated)
+    results = {(row.user_id, row.facet): row for row in (await db.execute(stmt)).all()}
+
+    user_amounts: Dict[str, int] = {}
+    for (user_id, _), amount in amounts.items():
+        user_amounts[user_id] = user_amounts.get(user_id, 0) + amount
+    user_totals, user_teams = await _increment_totals(db, guild_id, user_amounts)
+    # The ledger keeps every item as sent; only the upserts above needed them merged
+    await _record_events(db, guild_id, [(update.user_id, update.facet, update.amount) for update in score_updates])
+    users = _changed_users(list(results.values()), user_totals, user_teams)
+    version = await _bump_data_version(db, guild_id)
+    await _notify_change(db, "scores", version, guild_id, users=users)
+    team_medals = await _team_medal_rows(db, guild_id) if broadcaster.has_subscribers(guild_id) else None
 
-def get_leaderboard_data(db: Session) -> List[Dict[str, Any]]:
+    await db.commit()
+    _committed(guild_id, version)
+    _update_rank_index(guild_id, user_totals)
+    _publish_scores(guild_id, users, team_medals)
+    return results
+
+async def get_user_totals(db: AsyncSession) -> List[Tuple[str, str, int]]:
+    """Returns (guild_id, user_id, total_score) for every user with a score, across all guilds."""
+    return [(row.guild_id, row.user_id, row.total_score) for row in (await db.execute(
+        select(UserTotal.guild_id, UserTotal.user_id, UserTotal.total_score)
+    )).all()]
+
+def _user_totals_joined(*columns):
+    """The guild's user totals joined to each user's team, selecting columns."""
+    return select(*columns)\
+        .outerjoin(User, and_(User.guild_id == UserTotal.guild_id, User.name == UserTotal.user_id))\
+        .outerjoin(Team, Team.id == User.group_id)
+
+def _user_totals_query(guild_id: str):
+    return _user_totals_joined(UserTotal.user_id, UserTotal.total_score, Team.name.label('team_name'))\
+        .where(UserTotal.guild_id == guild_id)\
+        .order_by(UserTotal.total_score.desc(), UserTotal.user_id)
+
+async def get_users_with_scores_page(db: AsyncSession, guild_id: str, limit: int, after: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
     """
-    Fetches aggregated leaderboard data, joining with user and team info.
+    Keyset-paginated users of a guild ordered by total score desc, then user_id.
+    after is the (total_score, user_id) of the last row of the previous page.
     Each item contains user_id, total_score, and team_name.
     """
-    # This query joins Leaderboard with User and Team to get the team name for each user.
-    # It groups by user and team to calculate the total score.
-    query_result = db.query(
-        Leaderboard.user_id,
-        func.sum(Leaderboard.score).label('total_score'),
-        Team.name.label('team_name')
-    ).outerjoin(User, User.name == Leaderboard.user_id)\
-     .outerjoin(Team, Team.id == User.group_id)\
-     .group_by(Leaderboard.user_id, Team.name)\
-     .order_by(func.sum(Leaderboard.score).desc())\
-     .all()
+    query = _user_totals_query(guild_id)
+    if after is not None:
+        after_score, after_user_id = after
+        query = query.where(or_(
+            UserTotal.total_score < after_score,
+            and_(UserTotal.total_score == after_score, UserTotal.user_id > after_user_id)
+        ))
+    query_result = (await db.execute(query.limit(limit))).all()
 
-    # Convert the list of Row objects to a list of dictionaries
-    leaderboard_list = [
-        {"user_id": row.user_id, "total_score": row.total_score, "team_name": row.team_name}
+    return [
+        {
+            "user_id": row.user_id,
+            "total_score": row.total_score,
+            "team_name": row.team_name if row.team_name else "No Team"
+        }
         for row in query_result
     ]
-    return leaderboard_list
 
-def get_all_scores_by_user(db: Session, user_id: str) -> List[Dict[str, Any]]:
-    """Fetches all facet scores for a specific user."""
-    results = db.query(Leaderboard.facet, Leaderboard.score).filter(Leaderboard.user_id == user_id).all()
+async def get_users_table_page(
+    db: AsyncSession,
+    guild_id: str,
+    facets: List[str],
+    offset: int,
+    limit: int,
+    order_by: str = "total_score",
+    descending: bool = True,
+    search: Optional[str] = None
+) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+    """
+    One offset page of a guild's full leaderboard for table views, ordered by total_score, user_id,
+    team_name or any facet's score (ties broken by user_id). search keeps users whose name or
+    team name starts with it. Only the page's users have their facet scores loaded.
+    Returns (matching user count, rows); the count is None when there is no search (every user matches).
+    Each row contains user_id, team_name, total_score and a facets dict.
+    """
+    query = _user_totals_joined(UserTotal.user_id, UserTotal.total_score, Team.name.label('team_name'))\
+        .where(UserTotal.guild_id == guild_id)
+    if search:
+        # Each prefix match is its own indexed range scan (the text_pattern_ops indexes on PostgreSQL);
+        # an OR across the outer-joined team would filter every user in the guild instead
+        query = query.where(UserTotal.user_id.in_(
+            select(UserTotal.user_id)
+            .where(UserTotal.guild_id == guild_id, UserTotal.user_id.startswith(search, autoescape=True))
+            .union(
+                select(User.name).join(Team, Team.id == User.group_id)
+                .where(Team.guild_id == guild_id, Team.name.startswith(search, autoescape=True))
+            )
+        ))
+
+    filtered = None
+    if search:
+        filtered = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
+
+    if order_by in facets:
+        # Users without a row for the facet sort as 0, so this sorts all of the guild's (matching) users
+        facet_row = aliased(Leaderboard)
+        query = query.outerjoin(facet_row, and_(
+            facet_row.guild_id == guild_id, facet_row.user_id == UserTotal.user_id, facet_row.facet == order_by
+        ))
+        sort_column = func.coalesce(facet_row.score, 0)
+    elif order_by == "user_id":
+        sort_column = UserTotal.user_id
+    elif order_by == "team_name":
+        sort_column = Team.name
+    else:
+        sort_column = UserTotal.total_score
+    query = query.order_by(sort_column.desc() if descending else sort_column.asc(), UserTotal.user_id)
+    page = (await db.execute(query.offset(offset).limit(limit))).all()
+
+    facet_scores: Dict[str, Dict[str, int]] = {row.user_id: {} for row in page}
+    if page:
+        for row in (await db.execute(
+            select(Leaderboard.user_id, Leaderboard.facet, Leaderboard.score)
+            .where(Leaderboard.guild_id == guild_id, Leaderboard.user_id.in_(list(facet_scores)))
+        )).all():
+            facet_scores[row.user_id][row.facet] = row.score
+
+    return filtered, [
+        {
+            "user_id": row.user_id,
+            "team_name": row.team_name,
+            "total_score": row.total_score,
+            "facets": {facet: facet_scores[row.user_id].get(facet, 0) for facet in facets}
+        }
+        for row in page
+    ]
+
+def _dense_rank_cutoff(totals, max_rank: int):
+    """
+    Scalar subquery for the max_rank-th highest distinct value of totals (a select with one
+    column labelled "total"), or NULL when there are fewer distinct values.
+    """
+    total = totals.subquery().c.total
+    return select(total).distinct().order_by(total.desc()).offset(max_rank - 1).limit(1).scalar_subquery()
+
+async def get_leaderboard_with_facets(db: AsyncSession, guild_id: str, facets: List[str], window: str = "all", max_rank: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches every user's total score, team name and per-facet scores in a guild in a single query,
+    pivoting the facet rows into columns with conditional aggregation.
+    window "all" reads the running facet totals; "day"/"week"/"month" read the current rollup bucket.
+    max_rank keeps only users whose dense rank is within it (e.g. 3 for the medal table).
+    Each item contains user_id, total_score, team_name and a facets dict.
+    """
+    # Leaderboard and ScoreRollup both carry user_id, facet and score, so one pivot serves either
+    source = ScoreRollup if window in ROLLUP_PERIODS else Leaderboard
+    facet_columns = [
+        func.sum(case((source.facet == facet, source.score), else_=0)).label(f"facet_{i}")
+        for i, facet in enumerate(facets)
+    ]
+    if source is Leaderboard:
+        # Ranks on the maintained totals first (an index range scan when max_rank is set), then pivots
+        # only the chosen users' facet rows
+        ranked = select(UserTotal.user_id, UserTotal.total_score).where(UserTotal.guild_id == guild_id)
+        if max_rank is not None:
+            cutoff = _dense_rank_cutoff(
+                select(UserTotal.total_score.label('total')).where(UserTotal.guild_id == guild_id), max_rank
+            )
+            ranked = ranked.where(or_(cutoff.is_(None), UserTotal.total_score >= cutoff))
+        ranked = ranked.subquery()
+        query = select(
+            ranked.c.user_id,
+            ranked.c.total_score,
+            Team.name.label('team_name'),
+            *facet_columns
+        ).outerjoin(Leaderboard, and_(Leaderboard.guild_id == guild_id, Leaderboard.user_id == ranked.c.user_id))\
+         .outerjoin(User, and_(User.guild_id == guild_id, User.name == ranked.c.user_id))\
+         .outerjoin(Team, Team.id == User.group_id)\
+         .group_by(ranked.c.user_id, ranked.c.total_score, Team.name)\
+         .order_by(ranked.c.total_score.desc(), ranked.c.user_id)
+    else:
+        query = select(
+            source.user_id,
+            func.sum(source.score).label('total_score'),
+            Team.name.label('team_name'),
+            *facet_columns
+        ).outerjoin(User, and_(User.guild_id == source.guild_id, User.name == source.user_id))\
+         .outerjoin(Team, Team.id == User.group_id)\
+         .where(source.guild_id == guild_id, source.period == window, source.bucket_start == bucket_start(window))\
+         .group_by(source.user_id, Team.name)\
+         .order_by(func.sum(source.score).desc())
+        if max_rank is not None:
+            totals = select(func.sum(ScoreRollup.score).label('total'))\
+                .where(ScoreRollup.guild_id == guild_id, ScoreRollup.period == window, ScoreRollup.bucket_start == bucket_start(window))\
+                .group_by(ScoreRollup.user_id)
+            cutoff = _dense_rank_cutoff(totals, max_rank)
+            query = query.having(or_(cutoff.is_(None), func.sum(source.score) >= cutoff))
+    query_result = (await db.execute(query)).all()
+
+    return [
+        {
+            "user_id": row.user_id,
+            "total_score": row.total_score,
+            "team_name": row.team_name,
+            "facets": {facet: getattr(row, f"facet_{i}") for i, facet in enumerate(facets)}
+        }
+        for row in query_result
+    ]
+
+async def get_all_scores_by_user(db: AsyncSession, guild_id: str, user_id: str) -> List[Dict[str, Any]]:
+    """Fetches all facet scores for a specific user in a guild."""
+    results = (await db.execute(
+        select(Leaderboard.facet, Leaderboard.score).where(Leaderboard.guild_id == guild_id, Leaderboard.user_id == user_id)
+    )).all()
     user_scores = []
     for row in results:
         user_scores.append({"facet": row[0], "score": row[1]})  # Fix to access tuple elements
     return user_scores
 
-def add_team(db: Session, team_name: str) -> Team:
-    """Creates a new team in the database."""
-    db_team = Team(name=team_name)
+async def get_team_by_name(db: AsyncSession, guild_id: str, team_name: str) -> Optional[Team]:
+    """Returns the guild's team with this name, if any."""
+    return (await db.execute(select(Team).where(Team.guild_id == guild_id, Team.name == team_name))).scalars().first()
+
+async def add_team(db: AsyncSession, guild_id: str, team_name: str) -> Team:
+    """Creates a new team in the guild."""
+    db_team = Team(guild_id=guild_id, name=team_name)
     db.add(db_team)
-    db.commit()
-    db.refresh(db_team)
+    version = await _bump_data_version(db, guild_id)
+    await _notify_change(db, "teams", version, guild_id, team_name=team_name)
+    await db.commit()
+    _committed(guild_id, version)
+    await db.refresh(db_team)
     return db_team
 
-def add_user_to_team(db: Session, user_name: str, team_name: str) -> Optional[User]:
-    """Assigns an existing user to an existing team."""
+async def add_user_to_team(db: AsyncSession, guild_id: str, user_name: str, team_name: str) -> Optional[User]:
+    """Assigns an existing user to an existing team of the same guild."""
     # Find the team
-    db_team = db.query(Team).filter(Team.name == team_name).first()
+    db_team = await get_team_by_name(db, guild_id, team_name)
     if not db_team:
         return None # Or raise an exception
 
-    # Find or create the user
-    db_user = db.query(User).filter(User.name == user_name).first()
+    # Find or create the user (team eagerly loaded: async sessions can't lazy-load it later). The row stays
+    # locked until commit so score writes for this user (_increment_totals) can't interleave with the move
+    db_user = (await db.execute(
+        select(User).options(selectinload(User.team)).where(User.guild_id == guild_id, User.name == user_name)
+        .with_for_update(of=User)
+    )).scalars().first()
     if not db_user:
-        db_user = User(name=user_name, team=db_team)
+        db_user = User(guild_id=guild_id, name=user_name, team=db_team)
         db.add(db_user)
     else:
+        # Move the user's points from their old team's total to the new one
+        old_team_id = db_user.group_id
+        if old_team_id != db_team.id:
+            user_total = (await db.execute(
+                select(UserTotal.total_score).where(UserTotal.guild_id == guild_id, UserTotal.user_id == user_name)
+            )).scalar() or 0
+            moves = {db_team.id: user_total}
+            if old_team_id is not None:
+                moves[old_team_id] = -user_total
+            await _increment_team_totals(db, guild_id, moves)
         db_user.team = db_team
+    version = await _bump_data_version(db, guild_id)
+    await _notify_change(db, "team_assignment", version, guild_id, user_id=user_name, team_name=db_team.name)
+    team_medals = await _team_medal_rows(db, guild_id) if broadcaster.has_subscribers(guild_id) else None
 
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    _committed(guild_id, version)
+    broadcaster.publish(guild_id, "team_assignment", {
+        "etag": get_data_etag(guild_id=guild_id),
+        "user_id": user_name,
+        "team_name": db_team.name,
+        "teams": team_medals,
+    })
     return db_user
 
-def get_all_teams(db: Session) -> List[Team]:
-    """Returns all teams from the database."""
-    return db.query(Team).order_by(Team.name).all()
+async def get_all_teams(db: AsyncSession, guild_id: str) -> List[Team]:
+    """Returns all of a guild's teams."""
+    return list((await db.execute(select(Team).where(Team.guild_id == guild_id).order_by(Team.name))).scalars().all())
 
-def get_all_users(db: Session) -> List[User]:
-    """Returns all users from the database."""
-    return db.query(User).order_by(User.name).all()
+async def get_all_users(db: AsyncSession, guild_id: str) -> List[User]:
+    """Returns all of a guild's users, with their team loaded."""
+    return list((await db.execute(
+        select(User).options(selectinload(User.team)).where(User.guild_id == guild_id).order_by(User.name)
+    )).scalars().all())
 
-def get_team_leaderboard_data(db: Session) -> List[Dict[str, Any]]:
+async def get_team_breakdowns(db: AsyncSession, guild_id: str, team_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
-    Fetches aggregated team leaderboard data.
-    Each item contains team_name and total_score.
+    Total score, per-facet totals and member list for the guild's named teams (all teams if None),
+    from one grouped query over team x member x facet. Teams come back in name order, each
+    with team_name, total_score, facet_scores and members (members without scores included).
     """
-    # This query joins Leaderboard with User and Team to get team totals.
-    # It groups by team to calculate the total score for each team.
-    query_result = db.query(
+    query = select(
         Team.name.label('team_name'),
-        func.sum(Leaderboard.score).label('total_score')
-    ).join(User, User.group_id == Team.id)\
-     .join(Leaderboard, Leaderboard.user_id == User.name)\
-     .group_by(Team.name)\
-     .order_by(func.sum(Leaderboard.score).desc())\
-     .all()
+        User.name.label('user_name'),
+        Leaderboard.facet,
+        func.sum(Leaderboard.score).label('score')
+    ).outerjoin(User, User.group_id == Team.id)\
+     .outerjoin(Leaderboard, and_(Leaderboard.guild_id == User.guild_id, Leaderboard.user_id == User.name))\
+     .where(Team.guild_id == guild_id)\
+     .group_by(Team.name, User.name, Leaderboard.facet)\
+     .order_by(Team.name, User.name, Leaderboard.facet)
+    if team_names is not None:
+        query = query.where(Team.name.in_(team_names))
+
+    breakdowns: Dict[str, Dict[str, Any]] = {}
+    for row in (await db.execute(query)).all():
+        team = breakdowns.setdefault(row.team_name, {
+            "team_name": row.team_name, "total_score": 0, "facet_scores": {}, "members": []
+        })
+        if row.user_name is None:
+            continue
+        if not team["members"] or team["members"][-1] != row.user_name:
+            team["members"].append(row.user_name)
+        if row.facet is not None:
+            team["facet_scores"][row.facet] = team["facet_scores"].get(row.facet, 0) + row.score
+            team["total_score"] += row.score
+    return list(breakdowns.values())
+
+async def get_team_leaderboard_data(db: AsyncSession, guild_id: str, window: str = "all", max_rank: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches a guild's aggregated team leaderboard data.
+    window "all" reads the maintained team totals; "day"/"week"/"month" sum the current rollup
+    bucket by each user's current team.
+    max_rank keeps only teams whose dense rank is within it.
+    Each item contains team_name and total_score.
+    """
+    if window in ROLLUP_PERIODS:
+        total = func.sum(ScoreRollup.score)
+        bucket = and_(ScoreRollup.guild_id == guild_id, ScoreRollup.period == window, ScoreRollup.bucket_start == bucket_start(window))
+        member = and_(User.guild_id == ScoreRollup.guild_id, User.name == ScoreRollup.user_id)
+        query = select(Team.name.label('team_name'), total.label('total_score'))\
+            .join(User, member)\
+            .join(Team, Team.id == User.group_id)\
+            .where(bucket)\
+            .group_by(Team.name)\
+            .order_by(total.desc())
+        if max_rank is not None:
+            totals = select(total.label('total'))\
+                .join(User, member)\
+                .join(Team, Team.id == User.group_id)\
+                .where(bucket)\
+                .group_by(Team.name)
+            cutoff = _dense_rank_cutoff(totals, max_rank)
+            query = query.having(or_(cutoff.is_(None), total >= cutoff))
+    else:
+        # Reads the maintained per-team totals, highest first.
+        query = select(
+            Team.name.label('team_name'),
+            TeamTotal.total_score
+        ).join(Team, Team.id == TeamTotal.team_id)\
+         .where(TeamTotal.guild_id == guild_id)\
+         .order_by(TeamTotal.total_score.desc())
+        if max_rank is not None:
+            totals = select(TeamTotal.total_score.label('total')).where(TeamTotal.guild_id == guild_id)
+            cutoff = _dense_rank_cutoff(totals, max_rank)
+            query = query.where(or_(cutoff.is_(None), TeamTotal.total_score >= cutoff))
+    query_result = (await db.execute(query)).all()
 
     # Convert the list of Row objects to a list of dictionaries
     team_leaderboard_list = [
@@ -134,28 +722,88 @@ def get_team_leaderboard_data(db: Session) -> List[Dict[str, Any]]:
     ]
     return team_leaderboard_list
 
-def get_all_users_with_scores(db: Session) -> List[Dict[str, Any]]:
+# Joins a user to their facet rows in the same guild
+_user_scores = and_(Leaderboard.guild_id == User.guild_id, Leaderboard.user_id == User.name)
+
+async def rebuild_totals(db: AsyncSession):
+    """Recomputes every guild's user and team totals from the raw facet rows."""
+    await db.execute(delete(TeamTotal))
+    await db.execute(delete(UserTotal))
+    await db.execute(
+        _insert(db, UserTotal).from_select(
+            ["guild_id", "user_id", "total_score"],
+            select(Leaderboard.guild_id, Leaderboard.user_id, func.sum(Leaderboard.score))
+            .group_by(Leaderboard.guild_id, Leaderboard.user_id)
+        )
+    )
+    await db.execute(
+        _insert(db, TeamTotal).from_select(
+            ["team_id", "guild_id", "total_score"],
+            select(User.group_id, User.guild_id, func.sum(Leaderboard.score))
+            .join(Leaderboard, _user_scores)
+            .where(User.group_id.isnot(None))
+            .group_by(User.group_id, User.guild_id)
+        )
+    )
+    version = await _bump_data_version(db)
+    await _notify_change(db, "reload", version)
+    await db.commit()
+    _committed(None, version)
+    rank_indexes.load(await get_user_totals(db))
+    _publish_resync()
+
+async def rebuild_rollups(db: AsyncSession) -> int:
+    """Recomputes every guild's day/week/month rollup buckets from the score event ledger. Returns the bucket row count."""
+    bucket_amounts: Dict[Tuple[str, str, date, str, str], int] = {}
+    events = await db.stream(select(ScoreEvent.guild_id, ScoreEvent.user_id, ScoreEvent.facet, ScoreEvent.amount, ScoreEvent.created_at))
+    async for guild_id, user_id, facet, amount, created_at in events:
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        for period in ROLLUP_PERIODS:
+            key = (guild_id, period, bucket_start(period, created_at), user_id, facet)
+            bucket_amounts[key] = bucket_amounts.get(key, 0) + amount
+
+    await db.execute(delete(ScoreRollup))
+    if bucket_amounts:
+        await db.execute(_insert(db, ScoreRollup).values([
+            {"guild_id": guild_id, "period": period, "bucket_start": start, "user_id": user_id, "facet": facet, "score": amount}
+            for (guild_id, period, start, user_id, facet), amount in bucket_amounts.items()
+        ]))
+    version = await _bump_data_version(db)
+    await _notify_change(db, "reload", version)
+    await db.commit()
+    _committed(None, version)
+    return len(bucket_amounts)
+
+async def verify_totals(db: AsyncSession) -> Dict[str, List[Dict[str, Any]]]:
     """
-    Fetches all users with their total scores, ordered by total score descending.
-    Each item contains user_id, total_score, and team_name.
+    Compares every guild's maintained totals with totals recomputed from the raw facet rows.
+    Returns the mismatching users and teams (empty lists when everything agrees).
     """
-    query_result = db.query(
-        Leaderboard.user_id,
-        func.sum(Leaderboard.score).label('total_score'),
-        Team.name.label('team_name')
-    ).outerjoin(User, User.name == Leaderboard.user_id)\
-     .outerjoin(Team, Team.id == User.group_id)\
-     .group_by(Leaderboard.user_id, Team.name)\
-     .order_by(func.sum(Leaderboard.score).desc())\
-     .all()
+    def keyed(rows) -> Dict[Tuple, int]:
+        return {tuple(row[:-1]): row[-1] for row in rows}
 
-    # Convert the list of Row objects to a list of dictionaries
-    users_list = [
-        {
-            "user_id": row.user_id, 
-            "total_score": row.total_score, 
-            "team_name": row.team_name if row.team_name else "No Team"
-        }
-        for row in query_result
-    ]
-    return users_list
\ No newline at end of file
+    expected_users = keyed((await db.execute(
+        select(Leaderboard.guild_id, Leaderboard.user_id, func.sum(Leaderboard.score))
+        .group_by(Leaderboard.guild_id, Leaderboard.user_id)
+    )).all())
+    stored_users = keyed((await db.execute(select(UserTotal.guild_id, UserTotal.user_id, UserTotal.total_score))).all())
+    expected_teams = keyed((await db.execute(
+        select(User.group_id, func.sum(Leaderboard.score))
+        .join(Leaderboard, _user_scores)
+        .where(User.group_id.isnot(None))
+        .group_by(User.group_id)
+    )).all())
+    stored_teams = keyed((await db.execute(select(TeamTotal.team_id, TeamTotal.total_score))).all())
+
+    def mismatches(expected: Dict[Tuple, int], stored: Dict[Tuple, int], *keys: str) -> List[Dict[str, Any]]:
+        return [
+            {**dict(zip(keys, k)), "expected": expected.get(k, 0), "stored": stored.get(k, 0)}
+            for k in sorted(set(expected) | set(stored), key=str)
+            if expected.get(k, 0) != stored.get(k, 0)
+        ]
+
+    return {
+        "users": mismatches(expected_users, stored_users, "guild_id", "user_id"),
+        "teams": mismatches(expected_teams, stored_teams, "team_id"),
+    }
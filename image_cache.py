@@ -0,0 +1,85 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "8"))
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "16"))
+
+
+class ImageCache:
+    """
+    Bounded LRU cache of rendered leaderboard output (PNGs, HTML fragments), keyed by the leaderboard data version.
+    Concurrent misses for the same key share a single render.
+    """
+
+    def __init__(self, max_entries: int = IMAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._pending: Dict[Hashable, "asyncio.Future[bytes]"] = {}
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        image = self._entries.get(key)
+        if image is not None:
+            self._entries.move_to_end(key)
+        return image
+
+    def put(self, key: Hashable, image: bytes):
+        self._entries[key] = image
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_render(self, key: Hashable, render: Callable[[], Awaitable[bytes]]) -> Tuple[bytes, bool]:
+        """
+        Returns (image, hit). On a miss, render() runs once no matter how many requests are waiting. If the
+        request running it is cancelled (e.g. its client disconnected), a waiting request takes over the render.
+        """
+        image = self.get(key)
+        if image is not None:
+            self.hits += 1
+            return image, True
+
+        self.misses += 1
+        while (pending := self._pending.get(key)) is not None:
+            try:
+                return await asyncio.shield(pending), False
+            except asyncio.CancelledError:
+                # Only the render's own cancellation is retried; this request being cancelled propagates
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            image = self.get(key)
+            if image is not None:
+                return image, False
+
+        future: "asyncio.Future[bytes]" = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            image = await render()
+            self.put(key, image)
+            future.set_result(image)
+            return image, False
+        except BaseException as e:
+            # Waiters must always be woken, including when this request is cancelled mid-render
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception() # Mark as retrieved so waiter-less failures aren't logged as unhandled
+            raise
+        finally:
+            del self._pending[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+# Shared cache for /leaderboard/discord
+image_cache = ImageCache()
+# Rendered medal-table rows for /leaderboard (also what Playwright screenshots)
+fragment_cache = ImageCache(FRAGMENT_CACHE_SIZE)
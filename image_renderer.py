@@ -0,0 +1,158 @@
+import io
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+# "playwright" screenshots the /leaderboard page, "pillow" draws the same tables natively (no Chromium needed)
+LEADERBOARD_RENDERER = os.getenv("LEADERBOARD_RENDERER", "playwright").lower()
+LEADERBOARD_FONT_PATH = os.getenv("LEADERBOARD_FONT_PATH", "DejaVuSans.ttf")
+LEADERBOARD_BOLD_FONT_PATH = os.getenv("LEADERBOARD_BOLD_FONT_PATH", "DejaVuSans-Bold.ttf")
+
+# Colors mirror static/style.css so both backends produce the same look
+BACKGROUND = "#f0f2f5"
+TITLE_COLOR = "#1a237e"
+HEADER_BG = "#3f51b5"
+HEADER_FG = "#ffffff"
+ROW_BG = "#ffffff"
+ROW_ALT_BG = "#f8f9fa"
+BORDER = "#dddddd"
+TEXT = "#333333"
+MEDALS = {
+    1: ("Gold", "#ffd700"),
+    2: ("Silver", "#c0c0c0"),
+    3: ("Bronze", "#cd7f32"),
+}
+
+PADDING_X = 15
+PADDING_Y = 12
+PAGE_MARGIN = 32
+MEDAL_DIAMETER = 16
+
+
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+FONT = _load_font(LEADERBOARD_FONT_PATH, 16)
+HEADER_FONT = _load_font(LEADERBOARD_BOLD_FONT_PATH, 16)
+TITLE_FONT = _load_font(LEADERBOARD_BOLD_FONT_PATH, 32)
+
+
+def medal_rows(entries: Sequence[Dict[str, Any]], max_rank: int = 3) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Returns (rank, entry) for entries whose dense score rank is within max_rank,
+    the medal rows /leaderboard shows. Entries must be sorted by total_score desc.
+    """
+    rows = []
+    rank = 0
+    previous_score = None
+    for entry in entries:
+        if entry["total_score"] != previous_score:
+            rank += 1
+            previous_score = entry["total_score"]
+        if rank > max_rank:
+            break
+        rows.append((rank, entry))
+    return rows
+
+
+def _text_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont) -> Tuple[int, int]:
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    return right - left, bottom - top
+
+
+class _Table:
+    """Column/row layout for one leaderboard table; the first column holds the medal."""
+
+    def __init__(self, draw: ImageDraw.ImageDraw, headers: List[str], rows: List[Tuple[int, List[str]]]):
+        self.headers = headers
+        self.rows = rows
+        line_height = max(_text_size(draw, "Ag", HEADER_FONT)[1], _text_size(draw, "Ag", FONT)[1], MEDAL_DIAMETER)
+        self.row_height = line_height + 2 * PADDING_Y
+        self.col_widths = []
+        for col, header in enumerate(headers):
+            width = _text_size(draw, header, HEADER_FONT)[0]
+            for _rank, cells in rows:
+                cell_width = _text_size(draw, cells[col], FONT)[0]
+                if col == 0:
+                    cell_width += MEDAL_DIAMETER + 8
+                width = max(width, cell_width)
+            self.col_widths.append(width + 2 * PADDING_X)
+
+    @property
+    def width(self) -> int:
+        return sum(self.col_widths)
+
+    @property
+    def height(self) -> int:
+        return self.row_height * (len(self.rows) + 1)
+
+    def draw(self, draw: ImageDraw.ImageDraw, left: int, top: int):
+        self._draw_row(draw, left, top, self.headers, HEADER_BG, HEADER_FG, HEADER_FONT)
+        for i, (rank, cells) in enumerate(self.rows):
+            y = top + self.row_height * (i + 1)
+            background = ROW_ALT_BG if i % 2 else ROW_BG # Zebra striping, like the page's tr:nth-child(even)
+            self._draw_row(draw, left, y, cells, background, TEXT, FONT, medal_rank=rank)
+
+    def _draw_row(self, draw: ImageDraw.ImageDraw, left: int, top: int, cells: List[str], background: str,
+                  color: str, font: ImageFont.FreeTypeFont, medal_rank: Optional[int] = None):
+        x = left
+        for col, text in enumerate(cells):
+            width = self.col_widths[col]
+            draw.rectangle([x, top, x + width, top + self.row_height], fill=background, outline=BORDER)
+            text_x = x + PADDING_X
+            center_y = top + self.row_height // 2
+            if col == 0 and medal_rank in MEDALS:
+                radius = MEDAL_DIAMETER // 2
+                draw.ellipse([text_x, center_y - radius, text_x + MEDAL_DIAMETER, center_y + radius],
+                             fill=MEDALS[medal_rank][1], outline="#8a6d00")
+                text_x += MEDAL_DIAMETER + 8
+            draw.text((text_x, center_y), text, fill=color, font=font, anchor="lm")
+            x += width
+
+
+def render_leaderboard_png(leaderboard: List[Dict[str, Any]], team_leaderboard: List[Dict[str, Any]],
+                           facets: List[str], window: str = "all") -> bytes:
+    """
+    Draws the same medal tables as templates/leaderboard.html: top-3 users (with team and
+    per-facet scores) and top-3 teams. leaderboard entries carry user_id, total_score,
+    team_name and a facets dict; team entries carry team_name and total_score.
+    A window other than "all" is noted in the titles, as on the page.
+    """
+    suffix = f" (this {window})" if window != "all" else ""
+    user_headers = ["MEDAL", "USER", "TEAM", "TOTAL SCORE"] + [facet.replace("_", " ").upper() for facet in facets]
+    user_rows = [
+        (rank, [MEDALS[rank][0], str(entry["user_id"]), entry["team_name"] or "N/A", str(entry["total_score"])]
+               + [str(entry["facets"].get(facet, 0)) for facet in facets])
+        for rank, entry in medal_rows(leaderboard)
+    ]
+    team_rows = [
+        (rank, [MEDALS[rank][0], str(entry["team_name"]), str(entry["total_score"])])
+        for rank, entry in medal_rows(team_leaderboard)
+    ]
+
+    # Measure on a scratch canvas first so the final image is sized to fit
+    scratch = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    users_table = _Table(scratch, user_headers, user_rows)
+    teams_table = _Table(scratch, ["MEDAL", "TEAM", "TOTAL SCORE"], team_rows)
+    title_height = _text_size(scratch, "Leaders of Men", TITLE_FONT)[1] + PAGE_MARGIN
+
+    width = max(users_table.width, teams_table.width) + 2 * PAGE_MARGIN
+    height = PAGE_MARGIN + 2 * title_height + users_table.height + PAGE_MARGIN + teams_table.height + PAGE_MARGIN
+    image = Image.new("RGB", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    y = PAGE_MARGIN
+    for title, table in (("Leaders of Men" + suffix, users_table), ("Top Teams" + suffix, teams_table)):
+        draw.text((width // 2, y), title, fill=TITLE_COLOR, font=TITLE_FONT, anchor="mt")
+        y += title_height
+        table.draw(draw, (width - table.width) // 2, y)
+        y += table.height + PAGE_MARGIN
+
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=False)
+    return output.getvalue()
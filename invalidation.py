@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+from database import INVALIDATION_CHANNEL, apply_remote_change
+from models import ASYNC_DATABASE_URL
+
+INVALIDATION_PING_SECONDS = float(os.getenv("INVALIDATION_PING_SECONDS", "30")) # Liveness check on an idle connection
+INVALIDATION_RECONNECT_SECONDS = float(os.getenv("INVALIDATION_RECONNECT_SECONDS", "5"))
+INVALIDATION_START_TIMEOUT_SECONDS = float(os.getenv("INVALIDATION_START_TIMEOUT_SECONDS", "10")) # Startup wait for LISTEN
+
+
+def listen_dsn(url: str = ASYNC_DATABASE_URL) -> Optional[str]:
+    """Plain asyncpg DSN for the primary, or None when it isn't PostgreSQL (nothing to listen to)."""
+    scheme, _, rest = url.partition("://")
+    if scheme != "postgresql+asyncpg":
+        return None
+    return f"postgresql://{rest}"
+
+
+class InvalidationListener:
+    """
+    Keeps a dedicated connection (outside the SQLAlchemy pool) LISTENing on INVALIDATION_CHANNEL and applies
+    other workers' writes in the order they committed. When the connection drops it reconnects and reloads
+    everything, since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, dsn: Optional[str] = None, channel: str = INVALIDATION_CHANNEL):
+        self.dsn = dsn if dsn is not None else listen_dsn()
+        self.channel = channel
+        self._changes: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._listening = asyncio.Event()
+        self._reload_on_connect = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.dsn is not None
+
+    async def start(self, timeout: float = INVALIDATION_START_TIMEOUT_SECONDS):
+        """
+        Starts listening and waits until LISTEN is in place, so state loaded after this returns can't miss
+        a write. If the connection isn't up within timeout, startup goes on and the listener reloads
+        everything once it connects instead.
+        """
+        if not self.enabled or self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._apply_changes())]
+        try:
+            await asyncio.wait_for(self._listening.wait(), timeout)
+        except asyncio.TimeoutError:
+            if not self._listening.is_set():
+                print(f"[DB] Invalidation listener not connected after {timeout:g}s; it will reload once it is.")
+                self._reload_on_connect = True
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            self._changes.put_nowait(json.loads(payload))
+        except ValueError:
+            print(f"[DB] Ignoring malformed invalidation payload: {payload[:200]}")
+
+    async def _apply_changes(self):
+        while True:
+            change = await self._changes.get()
+            try:
+                await apply_remote_change(change)
+            except Exception as e:
+                print(f"[DB] Failed to apply invalidation {change.get('kind')}: {e}")
+
+    async def _listen(self):
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                # Named after the process, so each worker's listener can be told apart in pg_stat_activity
+                connection = await asyncpg.connect(
+                    self.dsn, server_settings={"application_name": f"leaderboard-invalidation:{os.getpid()}"}
+                )
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _connection: closed.set())
+                await connection.add_listener(self.channel, self._on_notification)
+                print(f"[DB] Listening for cache invalidations on '{self.channel}'.")
+                if connected_before or self._reload_on_connect:
+                    # Anything committed while we weren't listening (after startup loaded its state) was missed
+                    self._changes.put_nowait({"kind": "reload"})
+                    self._reload_on_connect = False
+                connected_before = True
+                self._listening.set()
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), timeout=INVALIDATION_PING_SECONDS)
+                    except asyncio.TimeoutError:
+                        await asyncio.wait_for(connection.execute("SELECT 1"), timeout=INVALIDATION_PING_SECONDS)
+                self._listening.clear()
+                print("[DB] Invalidation listener connection closed, reconnecting...")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._listening.clear()
+                print(f"[DB] Invalidation listener error, reconnecting in {INVALIDATION_RECONNECT_SECONDS:g}s: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close(timeout=5)
+            await asyncio.sleep(INVALIDATION_RECONNECT_SECONDS)
+
+
+# Shared listener, started by main.lifespan (a no-op unless the database is PostgreSQL)
+invalidation_listener = InvalidationListener()
@@ -1,53 +1,61 @@
 # === main.py ===
-from fastapi import FastAPI, Depends, Request
+from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
 from contextlib import asynccontextmanager
-from routes import router # Assuming your routes will be updated to use Depends(get_db)
-from models import create_tables # Import create_tables from models.py
-from database import get_db # Import get_db for dependency injection if needed directly here
+from routes import router # Routes take sessions via Depends(get_read_db) / Depends(get_write_db)
+from models import AsyncSessionLocal, async_engine, read_async_engine, create_tables, create_version_table, create_totals_tables, create_history_tables, ensure_guild_columns, ensure_indexes, ensure_user_facet_unique # Import create_tables from models.py
+from database import get_user_totals, load_data_versions, rebuild_rollups, rebuild_totals
 from sqlalchemy.orm import Session # Import Session for type hinting if needed
+from browser_pool import browser_pool
+from render_worker import render_workers
+from invalidation import invalidation_listener
+from image_renderer import LEADERBOARD_RENDERER
+from rank_index import rank_indexes
+from metrics import MetricsMiddleware
+from middleware import CompressionMiddleware, ProxyFixMiddleware, ServerTimingMiddleware
 import os
 import asyncio
 
-class ProxyFixMiddleware(BaseHTTPMiddleware):
-    """
-    Middleware to handle reverse proxy headers from Azure Container Apps.
-    This ensures that url_for() generates HTTPS URLs when behind a HTTPS proxy.
-    """
-    
-    async def dispatch(self, request: Request, call_next):
-        # Get forwarded headers
-        forwarded_proto = request.headers.get("x-forwarded-proto", "").lower()
-        forwarded_host = request.headers.get("x-forwarded-host", "")
-        forwarded_for = request.headers.get("x-forwarded-for", "")
-        
-        # Update the request scope with the correct scheme
-        if forwarded_proto in ["https", "http"]:
-            request.scope["scheme"] = forwarded_proto
-            
-        # Update the host if forwarded
-        if forwarded_host:
-            # Update server info for correct URL generation
-            port = 443 if forwarded_proto == "https" else 80
-            request.scope["server"] = (forwarded_host, port)
-            
-            # Update the host header
-            headers = dict(request.scope.get("headers", []))
-            headers[b"host"] = forwarded_host.encode()
-            request.scope["headers"] = list(headers.items())
-        
-        response = await call_next(request)
-        return response
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("[API] Application startup...")
     # Create database tables on startup
     print("[DB] Initializing database and creating tables if they don't exist...")
     #create_tables() # Call the function to create tables
+    ensure_guild_columns() # Databases from before guilds: existing rows move to DEFAULT_GUILD_ID
+    ensure_user_facet_unique() # Score upserts rely on the (guild_id, user_id, facet) unique index
+    create_version_table() # Every write (including the rebuilds below) bumps a shared data version row
+    if create_totals_tables():
+        # First start with the totals tables (or with guilds): backfill them from the existing facet rows
+        print("[DB] Totals tables created, building them from existing scores...")
+        async with AsyncSessionLocal() as db:
+            await rebuild_totals(db)
+    # Score event ledger and day/week/month rollups for windowed boards
+    if create_history_tables():
+        async with AsyncSessionLocal() as db:
+            await rebuild_rollups(db)
+    ensure_indexes() # Guild-scoped uniqueness, rank ordering and name search indexes
+    # Other workers' writes (PostgreSQL NOTIFY) keep this worker's version, rank index and caches current.
+    # Listening starts first, so no write can land between the snapshot below and the first notification
+    await invalidation_listener.start()
+    # Load the data versions (ETags, cache keys) and the in-memory rank indexes (one per guild) that serve /rank and /top
+    async with AsyncSessionLocal() as db:
+        await load_data_versions(db)
+        rank_indexes.load(await get_user_totals(db))
+    print(f"[DB] Rank indexes loaded with {len(rank_indexes)} users.")
     print("[DB] Database initialization complete.")
 
+    # Warm up the renderers once so /leaderboard/discord doesn't pay a process spawn or browser launch per request.
+    # With RENDER_WORKERS > 0 rendering happens in worker processes and this process never imports Playwright;
+    # otherwise the Chromium pool runs in-process (only for the Playwright backend; Pillow runs without Chromium)
+    if render_workers.enabled:
+        await render_workers.start(LEADERBOARD_RENDERER)
+    elif LEADERBOARD_RENDERER == "playwright":
+        try:
+            await browser_pool.start()
+        except Exception as e:
+            print(f"[BROWSER] Failed to start browser pool, renders will retry on demand: {e}")
+
     # Bot launching logic - keep if bot is still meant to run in the same process
     # Ensure your bot.py is adapted if it needs DB access through SQLAlchemy sessions
     if os.getenv("RUN_DISCORD_BOT") == "1":
@@ -57,14 +65,25 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"[BOT] Failed to launch bot: {e}")
     yield
+    await invalidation_listener.stop()
+    await render_workers.stop()
+    await browser_pool.stop()
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
     print("[API] Application shutdown.")
 
 app = FastAPI(title="Discord Leaderboard API", lifespan=lifespan)
 
+# Pure ASGI middleware only (no BaseHTTPMiddleware task/stream overhead); the last added runs first.
 # Add proxy fix middleware to handle Azure Container Apps forwarded headers
 app.add_middleware(ProxyFixMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+# Outermost, so latency covers the whole stack
+app.add_middleware(MetricsMiddleware)
 
-app.include_router(router) # Ensure routes in routes.py use Depends(get_db)
+app.include_router(router)
 
 # Static files mounting - ensure 'static' directory exists or is created if needed
 os.makedirs("static", exist_ok=True) # If you have static files served by FastAPI
@@ -0,0 +1,69 @@
+# === manage.py ===
+"""
+Maintenance commands for the leaderboard database.
+
+    python manage.py rebuild-totals   # recompute user/team totals from the raw facet rows
+    python manage.py verify-totals    # report totals that disagree with the raw facet rows
+    python manage.py rebuild-rollups  # recompute the day/week/month rollups from the score event ledger
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from models import AsyncSessionLocal, async_engine, create_history_tables, create_totals_tables, create_version_table, ensure_guild_columns
+from database import rebuild_rollups, rebuild_totals, verify_totals
+
+
+async def _rebuild_totals():
+    ensure_guild_columns()
+    create_version_table()
+    create_totals_tables()
+    async with AsyncSessionLocal() as db:
+        await rebuild_totals(db)
+        mismatches = await verify_totals(db)
+    print(f"[DB] Totals rebuilt. Mismatches after rebuild: {len(mismatches['users'])} users, {len(mismatches['teams'])} teams.")
+    return 0
+
+
+async def _verify_totals():
+    async with AsyncSessionLocal() as db:
+        mismatches = await verify_totals(db)
+    print(json.dumps(mismatches, indent=2))
+    return 1 if mismatches["users"] or mismatches["teams"] else 0
+
+
+async def _rebuild_rollups():
+    ensure_guild_columns()
+    create_version_table()
+    create_history_tables()
+    async with AsyncSessionLocal() as db:
+        buckets = await rebuild_rollups(db)
+    print(f"[DB] Rollups rebuilt: {buckets} bucket rows.")
+    return 0
+
+
+COMMANDS = {
+    "rebuild-totals": _rebuild_totals,
+    "verify-totals": _verify_totals,
+    "rebuild-rollups": _rebuild_rollups,
+}
+
+
+async def _run(command: str) -> int:
+    try:
+        return await COMMANDS[command]()
+    finally:
+        # Close pooled connections inside the loop (aiosqlite's worker threads would otherwise keep the process alive)
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run(args.command)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Everything here is an in-process counter/histogram update (no I/O), and labels are bounded:
+# route templates rather than raw paths, status classes, SQL verbs and fixed render stages.
+
+REQUEST_SECONDS = Histogram(
+    "leaderboard_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge("leaderboard_http_requests_in_flight", "HTTP requests currently being served")
+
+QUERY_SECONDS = Histogram(
+    "leaderboard_db_query_duration_seconds", "SQL statement execution time (its _count is the query count)",
+    ["statement"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+)
+POOL_CHECKOUT_WAIT_SECONDS = Histogram(
+    "leaderboard_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection",
+    buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 30),
+)
+POOL_CHECKED_OUT = Gauge("leaderboard_db_pool_checked_out", "DB connections currently checked out of the pool")
+
+RENDER_SECONDS = Histogram(
+    "leaderboard_render_duration_seconds", "Leaderboard image render time by stage",
+    ["stage"],  # launch, acquire, goto, screenshot (Playwright) or draw (Pillow); queue, worker with RENDER_WORKERS
+    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+
+SQL_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK"}
+
+# (stage, seconds) of the render running in this context, when collected. Render worker processes
+# have their own registry that nobody scrapes, so they hand their stage timings back with the PNG.
+_render_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("render_stages", default=None)
+
+
+@contextmanager
+def time_render_stage(stage: str) -> Iterator[None]:
+    """Times a render stage into RENDER_SECONDS, and into the collection started by collect_render_stages if any."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        RENDER_SECONDS.labels(stage=stage).observe(elapsed)
+        stages = _render_stages.get()
+        if stages is not None:
+            stages.append((stage, elapsed))
+
+
+@contextmanager
+def collect_render_stages() -> Iterator[List[Tuple[str, float]]]:
+    """Collects the stages timed in this context (and tasks started from it) into the yielded list."""
+    stages: List[Tuple[str, float]] = []
+    token = _render_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _render_stages.reset(token)
+
+
+def observe_render_stages(stages: Iterable[Tuple[str, float]]):
+    """Records stage timings collected in another process."""
+    for stage, seconds in stages:
+        RENDER_SECONDS.labels(stage=stage).observe(seconds)
+
+# [seconds, statements] for the current request when Server-Timing is on (see middleware.py)
+_request_queries: ContextVar[Optional[List[float]]] = ContextVar("request_queries", default=None)
+
+
+def start_query_timing() -> List[float]:
+    """Starts accumulating SQL time/count for the current request context; returns the live accumulator."""
+    timing = [0.0, 0]
+    _request_queries.set(timing)
+    return timing
+
+
+class MetricsMiddleware:
+    """
+    Raw ASGI middleware recording per-route latency and in-flight requests. The route label is the
+    matched path template (e.g. /get_user_scores/{user_id}), which FastAPI leaves in scope["route"].
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "<unmatched>"),
+                status=f"{status['code'] // 100}xx",
+            ).observe(time.perf_counter() - started)
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """The async engine's default pool, timing how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine, track_pool: bool = True):
+    """
+    Hooks query timing onto an engine (pass async_engine.sync_engine for async engines).
+    track_pool points the checked-out gauge at this engine's pool; only one engine can own it.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _observe_query(conn, statement)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.connection is not None:
+            _observe_query(exception_context.connection, exception_context.statement)
+
+    pool = engine.pool
+    if track_pool and hasattr(pool, "checkedout"):
+        POOL_CHECKED_OUT.set_function(pool.checkedout)
+
+
+def _observe_query(conn, statement: Optional[str]):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    words = (statement or "").split(None, 1)
+    verb = words[0].upper() if words else ""
+    elapsed = time.perf_counter() - started.pop()
+    QUERY_SECONDS.labels(statement=verb if verb in SQL_VERBS else "OTHER").observe(elapsed)
+    timing = _request_queries.get()
+    if timing is not None:
+        timing[0] += elapsed
+        timing[1] += 1
+
+
+def render_metrics() -> bytes:
+    return generate_latest()
@@ -0,0 +1,197 @@
+import os
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+from metrics import start_query_timing
+
+try:
+    import brotli # Optional: pip install brotli to serve br to clients that accept it
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024")) # Bytes; smaller bodies go out as-is
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6")) # gzip 1-9; brotli quality uses BROTLI_QUALITY
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = (b"text/html", b"application/json", b"text/css", b"text/javascript", b"application/javascript", b"text/plain")
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def _header(headers: Headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
+
+
+class ProxyFixMiddleware:
+    """
+    Applies reverse proxy headers from Azure Container Apps to the ASGI scope,
+    so url_for() generates HTTPS URLs when behind a HTTPS proxy.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        headers: Headers = scope["headers"]
+        forwarded_proto = (_header(headers, b"x-forwarded-proto") or b"").decode("latin-1").lower()
+        forwarded_host = _header(headers, b"x-forwarded-host")
+        if forwarded_proto not in ("https", "http") and not forwarded_host:
+            await self.app(scope, receive, send)
+            return
+
+        # Mutated in place: outer middleware reads what the router adds to this same scope (MetricsMiddleware's route label)
+        # Update the request scope with the correct scheme
+        if forwarded_proto in ("https", "http"):
+            scope["scheme"] = forwarded_proto
+        # Update the host (server info and Host header) for correct URL generation
+        if forwarded_host:
+            port = 443 if forwarded_proto == "https" else 80
+            scope["server"] = (forwarded_host.decode("latin-1"), port)
+            scope["headers"] = [(key, value) for key, value in headers if key != b"host"] + [(b"host", forwarded_host)]
+        await self.app(scope, receive, send)
+
+
+class CompressionMiddleware:
+    """
+    Compresses HTML/JSON/static text responses with brotli (if installed and accepted) or gzip.
+    Single-chunk bodies under COMPRESSION_MIN_SIZE are left alone; streamed bodies are compressed
+    chunk by chunk. Event streams, ranges and already-encoded responses pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = (_header(scope["headers"], b"accept-encoding") or b"").decode("latin-1").lower()
+        if brotli is not None and "br" in accept_encoding:
+            encoding = "br"
+        elif "gzip" in accept_encoding:
+            encoding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = _header(headers, b"content-type") or b""
+                if (not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or _header(headers, b"content-encoding") is not None
+                        or message["status"] in (204, 206, 304)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message # Held until the first body chunk decides the framing
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [(key, value) for key, value in start_message.get("headers", []) if key != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                vary = _header(headers, b"vary")
+                if vary is None:
+                    headers.append((b"vary", b"Accept-Encoding"))
+                elif b"accept-encoding" not in vary.lower():
+                    headers = [(key, value + b", Accept-Encoding" if key == b"vary" else value) for key, value in headers]
+                if not more_body:
+                    compressed = compressor.compress(body) + compressor.flush()
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start_message, "headers": headers})
+
+            chunk = compressor.compress(body)
+            if more_body:
+                chunk += compressor.sync_flush() # Stream each chunk promptly rather than buffering
+            else:
+                chunk += compressor.flush()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder with a common interface."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def sync_flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.flush()
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header: total time until the response headers were sent ("app") and the
+    time and count of SQL statements the request ran ("db"), for browser devtools and tracing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        db_timing = start_query_timing()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                app_ms = (time.perf_counter() - started) * 1000
+                db_ms = db_timing[0] * 1000
+                value = f'app;dur={app_ms:.1f}, db;dur={db_ms:.1f};desc="{db_timing[1]} queries"'
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", value.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -1,10 +1,13 @@
 # === models.py ===
-from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, func, ForeignKey
+from pydantic import BaseModel, Field
+from typing import List, Literal
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, func, ForeignKey, Index, PrimaryKeyConstraint, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import os
 
+from metrics import TimedAsyncAdaptedQueuePool, instrument_engine
 from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
@@ -16,62 +19,294 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 
-if not all([POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DB]):
-    raise ValueError("Missing one or more PostgreSQL environment variables: POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DB")
+def async_url(url: str) -> str:
+    """Maps a sync database URL to its async-driver equivalent (asyncpg for PostgreSQL, aiosqlite for SQLite)."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    scheme, rest = url.split("://", 1)
+    if scheme.split("+")[0] in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
 
-DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+# DATABASE_URL overrides the POSTGRES_* settings, e.g. sqlite:///bench.db for local runs and benchmarks
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    if not all([POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DB]):
+        raise ValueError("Missing one or more PostgreSQL environment variables: POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_DB")
+    DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+ASYNC_DATABASE_URL = async_url(DATABASE_URL)
+
+# Sync engine for startup DDL/migrations; request handling goes through the async engine
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncAdaptedQueuePool)
+instrument_engine(async_engine.sync_engine) # Query counts/durations for /metrics
+# expire_on_commit=False: returned objects stay readable after commit without an implicit (sync) refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replica (e.g. a streaming-replication standby, or a second SQLite file for local runs).
+# Read-only routes use it via database.get_read_db; writes and DDL always go to the primary above.
+READ_REPLICA_DATABASE_URL = os.getenv("READ_REPLICA_DATABASE_URL")
+if READ_REPLICA_DATABASE_URL:
+    read_async_engine = create_async_engine(async_url(READ_REPLICA_DATABASE_URL), poolclass=TimedAsyncAdaptedQueuePool)
+    instrument_engine(read_async_engine.sync_engine, track_pool=False) # The pool gauge stays on the primary
+    ReadSessionLocal = async_sessionmaker(read_async_engine, autoflush=False, expire_on_commit=False)
+else:
+    read_async_engine = async_engine
+    ReadSessionLocal = AsyncSessionLocal
 Base = declarative_base()
 
+# Every table is scoped to a Discord server (guild). Rows from before guilds existed, and API calls that
+# don't name one, belong to DEFAULT_GUILD_ID: set it to a single-server deployment's guild ID before the
+# first start with guild columns so its existing board stays with that server.
+DEFAULT_GUILD_ID = os.getenv("DEFAULT_GUILD_ID", "default")
+GUILD_ID_MAX_LENGTH = 32 # Discord snowflakes are at most 20 digits
+
+def guild_column():
+    return Column(String, nullable=False, default=DEFAULT_GUILD_ID, server_default=DEFAULT_GUILD_ID)
+
+# Guilds share tables instead of PostgreSQL partitions (a partition per guild would mean DDL whenever a server
+# joins); every lookup and ordering index leads with guild_id, so a guild's queries scan only its own index ranges.
+
 # SQLAlchemy model for the leaderboard
 class Leaderboard(Base):
     __tablename__ = "leaderboard"
 
     id = Column(Integer, primary_key=True, index=True)
+    guild_id = guild_column()
     user_id = Column(String, index=True, nullable=False) # Discord username#discriminator
     facet = Column(String, index=True, nullable=False)
     score = Column(Integer, default=0, nullable=False)
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
-    # You might want a unique constraint on user_id and facet combined
-    # from sqlalchemy.schema import UniqueConstraint
-    # __table_args__ = (UniqueConstraint('user_id', 'facet', name='_user_facet_uc'),)
+# One running total per user and facet in each guild; score writes upsert against this
+Index('_guild_user_facet_uc', Leaderboard.guild_id, Leaderboard.user_id, Leaderboard.facet, unique=True)
 
 # New SQLAlchemy models for Teams and Users
 class Team(Base):
     __tablename__ = "leaderboard_teams"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True, nullable=False)
+    guild_id = guild_column()
+    name = Column(String, nullable=False)
     
     # Relationship to the User model
     users = relationship("User", back_populates="team")
 
+# Team names are unique within a guild
+Index('ix_leaderboard_teams_guild_name', Team.guild_id, Team.name, unique=True)
+# LIKE 'prefix%' can only use a btree with the pattern operator class under a non-C collation (full-board search)
+Index('ix_leaderboard_teams_guild_name_prefix', Team.guild_id, Team.name,
+      postgresql_ops={'name': 'text_pattern_ops'}).ddl_if(dialect='postgresql')
+
 class User(Base):
     __tablename__ = "leaderboard_users"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True, nullable=False) # Discord username#discriminator
+    guild_id = guild_column()
+    name = Column(String, nullable=False) # Discord username#discriminator
     group_id = Column(Integer, ForeignKey("leaderboard_teams.id"))
 
     # Relationship to the Team model
     team = relationship("Team", back_populates="users")
 
+Index('ix_leaderboard_users_guild_name', User.guild_id, User.name, unique=True)
+# Finds the members of the teams a full-board search matched
+Index('ix_leaderboard_users_group_id', User.group_id)
+
+# Running totals maintained in the same transaction as each score write, so leaderboard
+# reads are indexed top-N scans instead of SUM/GROUP BY over every facet row
+class UserTotal(Base):
+    __tablename__ = "leaderboard_user_totals"
+    guild_id = Column(String, primary_key=True)
+    user_id = Column(String, primary_key=True) # Same key as Leaderboard.user_id / User.name
+    total_score = Column(Integer, default=0, nullable=False)
+
+# Matches the leaderboard ordering (total desc, user_id asc) within a guild so keyset pages are index range scans
+Index('ix_user_totals_rank', UserTotal.guild_id, UserTotal.total_score.desc(), UserTotal.user_id)
+# Prefix search on user names in the full-board table (SQLite's LIKE can't use an index either way)
+Index('ix_user_totals_user_prefix', UserTotal.guild_id, UserTotal.user_id,
+      postgresql_ops={'user_id': 'text_pattern_ops'}).ddl_if(dialect='postgresql')
+
+class TeamTotal(Base):
+    __tablename__ = "leaderboard_team_totals"
+    team_id = Column(Integer, ForeignKey("leaderboard_teams.id"), primary_key=True)
+    guild_id = Column(String, nullable=False) # The team's guild, so team boards are guild-scoped index scans
+    total_score = Column(Integer, default=0, nullable=False)
+
+Index('ix_team_totals_rank', TeamTotal.guild_id, TeamTotal.total_score.desc())
+
+# Append-only ledger: one immutable row per score award, kept for history and rollup rebuilds
+class ScoreEvent(Base):
+    __tablename__ = "leaderboard_score_events"
+    id = Column(Integer, primary_key=True)
+    guild_id = guild_column()
+    user_id = Column(String, nullable=False, index=True)
+    facet = Column(String, nullable=False)
+    amount = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+# Per-period sums of the events, maintained with each write so windowed boards read one bucket
+# instead of scanning the ledger. period is one of ROLLUP_PERIODS; bucket_start is the UTC day,
+# ISO week (Monday) or month the events fell in.
+class ScoreRollup(Base):
+    __tablename__ = "leaderboard_score_rollups"
+    guild_id = Column(String, nullable=False)
+    period = Column(String, nullable=False)
+    bucket_start = Column(Date, nullable=False)
+    user_id = Column(String, nullable=False)
+    facet = Column(String, nullable=False)
+    score = Column(Integer, default=0, nullable=False)
+
+    # Guild first: a windowed board reads one (guild, period, bucket) range
+    __table_args__ = (PrimaryKeyConstraint('guild_id', 'period', 'bucket_start', 'user_id', 'facet'),)
+
+# Leaderboard data versions, shared by every worker: each write bumps its guild's row in its own transaction,
+# so ETags and cache keys derived from them agree across workers and restarts. The GLOBAL_VERSION_KEY row is
+# bumped by rebuilds that touch every guild; a guild's version is the sum of both rows.
+class DataVersion(Base):
+    __tablename__ = "leaderboard_data_versions"
+    guild_id = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+GLOBAL_VERSION_KEY = "" # Never a guild_id (those are at least one character)
+
+ROLLUP_PERIODS = ("day", "week", "month")
+# Leaderboard windows: all-time reads the running totals, the rest read the current rollup bucket
+LeaderboardWindow = Literal["all", "day", "week", "month"]
+
+
 
 # Pydantic model for request body
-class ScoreUpdate(BaseModel):
+class ScoreItem(BaseModel):
     user_id: str
     facet: str
     amount: int
 
+class ScoreUpdate(ScoreItem):
+    guild_id: str = Field(DEFAULT_GUILD_ID, min_length=1, max_length=GUILD_ID_MAX_LENGTH)
+
+class ScoreBatch(BaseModel):
+    guild_id: str = Field(DEFAULT_GUILD_ID, min_length=1, max_length=GUILD_ID_MAX_LENGTH) # Every item goes to this guild
+    items: List[ScoreItem] = Field(..., min_length=1, max_length=500)
+    # "all_or_nothing" rejects the whole batch if any item is invalid; "best_effort" applies the valid ones
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
 # Pydantic models for new routes
 class TeamCreate(BaseModel):
+    guild_id: str = Field(DEFAULT_GUILD_ID, min_length=1, max_length=GUILD_ID_MAX_LENGTH)
     name: str
 
 class UserTeamAssign(BaseModel):
+    guild_id: str = Field(DEFAULT_GUILD_ID, min_length=1, max_length=GUILD_ID_MAX_LENGTH)
     user_name: str
     team_name: str
 
 # Function to create tables (call this once at startup if tables don't exist)
 def create_tables():
     Base.metadata.create_all(bind=engine)
+
+def create_version_table():
+    """Creates the data version table if missing (run before anything that writes)."""
+    Base.metadata.create_all(bind=engine, tables=[DataVersion.__table__])
+
+def create_totals_tables() -> bool:
+    """Creates the user/team totals tables if missing. Returns True if they were just created and need a rebuild."""
+    inspector = inspect(engine)
+    missing = [
+        model.__table__ for model in (UserTotal, TeamTotal)
+        if not inspector.has_table(model.__tablename__)
+    ]
+    if missing:
+        Base.metadata.create_all(bind=engine, tables=missing)
+    return bool(missing)
+
+def create_history_tables() -> bool:
+    """
+    Creates the score event ledger and rollup tables if missing (history starts from their creation).
+    Returns True if the rollup table was just created, so any existing ledger needs rolling up.
+    """
+    rollups_missing = not inspect(engine).has_table(ScoreRollup.__tablename__)
+    Base.metadata.create_all(bind=engine, tables=[ScoreEvent.__table__, ScoreRollup.__table__])
+    return rollups_missing
+
+# Indexes no query uses any more
+_OBSOLETE_INDEXES = ["ix_leaderboard_guild_facet_rank"]
+
+def ensure_indexes():
+    """
+    Creates indexes declared after their tables existed (create_all skips tables that are already there)
+    and drops _OBSOLETE_INDEXES.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for name in _OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+# Global unique constraints/indexes from before guilds, replaced by the guild-scoped ones above
+_PRE_GUILD_INDEXES = {
+    "leaderboard": ["_user_facet_uc", "ix_leaderboard_facet_rank"],
+    "leaderboard_teams": ["ix_leaderboard_teams_name"],
+    "leaderboard_users": ["ix_leaderboard_users_name"],
+}
+
+def ensure_guild_columns():
+    """
+    Migrates databases created before guilds: the leaderboard, team, user and event tables get guild_id
+    (DEFAULT_GUILD_ID for existing rows) and lose their global unique indexes. Totals and rollups are
+    derived, so those tables are dropped instead, for create_totals_tables/create_history_tables to
+    recreate and rebuild per guild.
+    """
+    inspector = inspect(engine)
+    default = DEFAULT_GUILD_ID.replace("'", "''")
+    with engine.begin() as conn:
+        for model in (Leaderboard, Team, User, ScoreEvent):
+            table = model.__tablename__
+            if not inspector.has_table(table) or "guild_id" in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            print(f"[DB] Adding guild_id to {table} (existing rows go to guild '{DEFAULT_GUILD_ID}')...")
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN guild_id VARCHAR NOT NULL DEFAULT '{default}'"))
+            constraints = {uc["name"] for uc in inspector.get_unique_constraints(table)}
+            indexes = {ix["name"] for ix in inspector.get_indexes(table)}
+            for name in _PRE_GUILD_INDEXES.get(table, []):
+                if name in constraints:
+                    if conn.dialect.name == "sqlite":
+                        # SQLite can't drop a constraint declared in CREATE TABLE without rebuilding the table
+                        print(f"[DB] Warning: {table} keeps its global {name} constraint on SQLite; "
+                              "the same user and facet can't score in two guilds until the database is recreated.")
+                    else:
+                        conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {name}"))
+                elif name in indexes:
+                    conn.execute(text(f"DROP INDEX {name}"))
+        for model in (TeamTotal, UserTotal, ScoreRollup):
+            table = model.__tablename__
+            if inspector.has_table(table) and "guild_id" not in {c["name"] for c in inspector.get_columns(table)}:
+                print(f"[DB] Dropping {table} to rebuild it per guild...")
+                conn.execute(text(f"DROP TABLE {table}"))
+
+def ensure_user_facet_unique():
+    """
+    Enforces _guild_user_facet_uc on databases created before it existed (run after ensure_guild_columns).
+    Duplicate (guild_id, user_id, facet) rows are merged into the oldest row first so the index can be built.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(Leaderboard.__tablename__):
+        return
+    existing = {uc["name"] for uc in inspector.get_unique_constraints(Leaderboard.__tablename__)}
+    existing |= {ix["name"] for ix in inspector.get_indexes(Leaderboard.__tablename__)}
+    if "_guild_user_facet_uc" in existing:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE leaderboard SET score = (
+                SELECT SUM(dup.score) FROM leaderboard dup
+                WHERE dup.guild_id = leaderboard.guild_id AND dup.user_id = leaderboard.user_id AND dup.facet = leaderboard.facet
+            )
+            WHERE id IN (SELECT MIN(id) FROM leaderboard GROUP BY guild_id, user_id, facet HAVING COUNT(*) > 1)
+        """))
+        conn.execute(text("DELETE FROM leaderboard WHERE id NOT IN (SELECT MIN(id) FROM leaderboard GROUP BY guild_id, user_id, facet)"))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS _guild_user_facet_uc ON leaderboard (guild_id, user_id, facet)"))
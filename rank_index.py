@@ -0,0 +1,217 @@
+import math
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class _Node:
+    __slots__ = ("value", "next", "width")
+
+    def __init__(self, value: Any, levels: int):
+        self.value = value
+        self.next: List[Optional["_Node"]] = [None] * levels
+        # width[level] = number of bottom-level steps to next[level] (or to the end of the list)
+        self.width = [1] * levels
+
+
+class IndexableSkiplist:
+    """
+    Sorted container with O(log n) insert, remove, lookup by position and position-of-value.
+    Values must be unique and mutually comparable.
+    """
+
+    def __init__(self, max_levels: int = 24):
+        self.max_levels = max_levels
+        self.size = 0
+        self.head = _Node(None, max_levels)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _random_levels(self) -> int:
+        return min(self.max_levels, 1 - int(math.log(1.0 - random.random(), 2.0)))
+
+    def insert(self, value: Any):
+        chain: List[_Node] = [self.head] * self.max_levels
+        steps_at_level = [0] * self.max_levels
+        node = self.head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not None and node.next[level].value <= value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new_node = _Node(value, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, value: Any):
+        chain: List[_Node] = [self.head] * self.max_levels
+        node = self.head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.value != value:
+            raise KeyError(value)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def _node_at(self, index: int) -> _Node:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        node = self.head
+        remaining = index + 1
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> Any:
+        return self._node_at(index).value
+
+    def iter_from(self, index: int) -> Iterator[Any]:
+        """Yields values in order starting at position index."""
+        if index >= self.size:
+            return
+        node: Optional[_Node] = self._node_at(index)
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+    def bisect_left(self, value: Any) -> int:
+        """Number of values strictly less than value."""
+        node = self.head
+        position = 0
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not None and node.next[level].value < value:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+
+class RankIndex:
+    """
+    In-memory ordering of users by total score with dense-rank semantics
+    (equal totals share a rank, the next distinct total gets rank + 1), matching the
+    medal rows on /leaderboard. All lookups and updates are O(log n).
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._scores: Dict[str, int] = {}
+        self._entries = IndexableSkiplist() # (-score, user_id): highest score first, ties by user_id
+        self._distinct = IndexableSkiplist() # -score for every distinct total
+        self._score_counts: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def load(self, totals: Iterable[Tuple[str, int]]):
+        """Replaces the index contents with (user_id, total_score) pairs."""
+        self.clear()
+        for user_id, total_score in totals:
+            self.set_score(user_id, total_score)
+
+    def set_score(self, user_id: str, total_score: int):
+        old_score = self._scores.get(user_id)
+        if old_score == total_score:
+            return
+        if old_score is not None:
+            self._entries.remove((-old_score, user_id))
+            self._score_counts[old_score] -= 1
+            if not self._score_counts[old_score]:
+                del self._score_counts[old_score]
+                self._distinct.remove(-old_score)
+
+        self._scores[user_id] = total_score
+        self._entries.insert((-total_score, user_id))
+        if total_score not in self._score_counts:
+            self._score_counts[total_score] = 0
+            self._distinct.insert(-total_score)
+        self._score_counts[total_score] += 1
+
+    def dense_rank_of_score(self, total_score: int) -> int:
+        return self._distinct.bisect_left(-total_score) + 1
+
+    def rank_of(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Dense rank and 1-based position of a user, or None if the user has no score."""
+        total_score = self._scores.get(user_id)
+        if total_score is None:
+            return None
+        return {
+            "user_id": user_id,
+            "total_score": total_score,
+            "rank": self.dense_rank_of_score(total_score),
+            "position": self._entries.bisect_left((-total_score, user_id)) + 1,
+            "total_users": len(self._scores),
+        }
+
+    def top(self, k: int) -> List[Dict[str, Any]]:
+        """Every user whose dense rank is <= k, i.e. the top k distinct totals including ties."""
+        if k <= 0 or not self._scores:
+            return []
+        lowest_score = -self._distinct[min(k, len(self._distinct)) - 1]
+        results = []
+        rank = 0
+        previous_score = None
+        for negative_score, user_id in self._entries.iter_from(0):
+            total_score = -negative_score
+            if total_score < lowest_score:
+                break
+            if total_score != previous_score:
+                rank += 1
+                previous_score = total_score
+            results.append({"user_id": user_id, "total_score": total_score, "rank": rank})
+        return results
+
+
+class GuildRankIndexes:
+    """One RankIndex per guild, so ranks and sizes only ever count a guild's own users."""
+
+    def __init__(self):
+        self._indexes: Dict[str, RankIndex] = {}
+        self._empty = RankIndex() # Answers reads for guilds without scores; never written to
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+    def __getitem__(self, guild_id: str) -> RankIndex:
+        """The guild's index for writing, created on first use."""
+        index = self._indexes.get(guild_id)
+        if index is None:
+            index = self._indexes[guild_id] = RankIndex()
+        return index
+
+    def get(self, guild_id: str) -> RankIndex:
+        """The guild's index for reading (an empty one if it has no scores), without creating it."""
+        return self._indexes.get(guild_id, self._empty)
+
+    def load(self, totals: Iterable[Tuple[str, str, int]]):
+        """Replaces every guild's contents with (guild_id, user_id, total_score) rows."""
+        self._indexes = {}
+        for guild_id, user_id, total_score in totals:
+            self[guild_id].set_score(user_id, total_score)
+
+
+# Shared indexes, loaded in main.lifespan and kept current by the score writes in database.py
+rank_indexes = GuildRankIndexes()
@@ -0,0 +1,144 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.util import Finalize
+from typing import Any, List, Optional, Tuple
+
+from metrics import RENDER_SECONDS, collect_render_stages, observe_render_stages, time_render_stage
+
+# Leaderboard images are rendered in separate processes so Chromium (or a Pillow draw) never competes with
+# request handling for the API's CPU, memory or GIL. 0 renders in the API process as before.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "1"))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "30")) # Queue wait + render, per job
+
+# Per-worker-process state, set up by _init_worker
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_browser_pool = None
+
+
+def _init_worker():
+    global _worker_loop, _worker_browser_pool
+    from browser_pool import BrowserPool # Only worker processes load the Playwright client
+
+    # Ctrl+C reaches the whole process group; the API process shuts workers down in order instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_browser_pool = BrowserPool(size=1) # A worker runs one job at a time
+    # Worker processes exit through multiprocessing's shutdown hooks (not atexit), which run Finalize callbacks
+    Finalize(None, _stop_worker, exitpriority=10)
+
+
+def _stop_worker():
+    if _worker_browser_pool.started:
+        _worker_loop.run_until_complete(_worker_browser_pool.stop())
+    _worker_loop.close()
+
+
+def _warm_up(renderer: str) -> List[Tuple[str, float]]:
+    """
+    Launches the worker's browser ahead of the first job (Playwright only; a worker that misses it starts on its first job).
+    Returns the launch's stage timings for the API process to record.
+    """
+    with collect_render_stages() as stages:
+        if renderer == "playwright":
+            _worker_loop.run_until_complete(_worker_browser_pool.start())
+    return stages
+
+
+def _render_job(renderer: str, payload: Any) -> Tuple[bytes, float, float, List[Tuple[str, float]]]:
+    """
+    Runs in a worker. payload is the page URL for "playwright" or render_leaderboard_png's arguments for "pillow".
+    Returns (png, wall-clock start, seconds spent rendering, (stage, seconds) timings) so the API can time
+    queueing and rendering, and record the stages (this process's metrics are never scraped).
+    """
+    started = time.time()
+    with collect_render_stages() as stages:
+        if renderer == "pillow":
+            from image_renderer import render_leaderboard_png
+            with time_render_stage("draw"):
+                png = render_leaderboard_png(*payload)
+        else:
+            png = _worker_loop.run_until_complete(_worker_browser_pool.render(payload))
+    return png, started, time.time() - started, stages
+
+
+class RenderWorkerPool:
+    """
+    Process pool that renders leaderboard images. Jobs wait in the executor's local queue until a worker is free,
+    and each worker keeps a warm browser page. A crashed worker (e.g. Chromium killed for memory) fails its job
+    and the pool is replaced on the next render.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS, timeout: float = RENDER_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"), # Never fork the API's event loop, DB pools or threads
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def start(self, renderer: str):
+        """Spawns every worker (and its browser, for Playwright) so the first render doesn't pay for it."""
+        executor = self._ensure_executor()
+        print(f"[RENDER] Starting {self.workers} render worker(s) for {renderer}...")
+        try:
+            for stages in await asyncio.gather(*(
+                asyncio.wrap_future(executor.submit(_warm_up, renderer)) for _ in range(self.workers)
+            )):
+                observe_render_stages(stages)
+            print("[RENDER] Render workers ready.")
+        except Exception as e:
+            print(f"[RENDER] Failed to warm up render workers, renders will retry on demand: {e}")
+
+    async def stop(self):
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+            print("[RENDER] Render workers stopped.")
+
+    async def render(self, renderer: str, payload: Any) -> bytes:
+        """Queues a render and waits up to timeout for the PNG."""
+        executor = self._ensure_executor()
+        submitted = time.time()
+        try:
+            future: Future = executor.submit(_render_job, renderer, payload)
+        except BrokenProcessPool:
+            self._discard(executor)
+            future = self._ensure_executor().submit(_render_job, renderer, payload)
+        try:
+            png, started, elapsed, stages = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel() # Drops the job if it is still queued; one already running finishes in its worker
+            raise TimeoutError(f"render did not finish within {self.timeout:g}s")
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        RENDER_SECONDS.labels(stage="queue").observe(max(0.0, started - submitted))
+        RENDER_SECONDS.labels(stage="worker").observe(elapsed)
+        observe_render_stages(stages)
+        return png
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        if self._executor is executor:
+            print("[RENDER] A render worker died, replacing the pool.")
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared pool, started by main.lifespan when RENDER_WORKERS > 0
+render_workers = RenderWorkerPool()
@@ -1,14 +1,24 @@
 # === routes.py ===
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from models import ScoreUpdate, TeamCreate, UserTeamAssign
-from database import get_db, add_score as db_add_score, get_leaderboard_data as db_get_leaderboard_data, get_all_scores_by_user, add_team, add_user_to_team, get_all_teams, get_all_users, get_team_leaderboard_data, get_all_users_with_scores
-from sqlalchemy.orm import Session
-from starlette.background import BackgroundTask
-import tempfile
-from playwright.async_api import async_playwright
+from models import ScoreUpdate, ScoreBatch, TeamCreate, UserTeamAssign, LeaderboardWindow, ROLLUP_PERIODS, DEFAULT_GUILD_ID, GUILD_ID_MAX_LENGTH
+from database import get_read_db, get_write_db, add_score as db_add_score, add_scores as db_add_scores, get_leaderboard_with_facets, get_all_scores_by_user, add_team, add_user_to_team, get_all_teams, get_all_users, get_team_by_name, get_team_breakdowns, get_team_leaderboard_data, get_users_with_scores_page, get_users_table_page, get_data_version, get_data_etag, bucket_start
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from browser_pool import browser_pool
+from render_worker import render_workers
+from image_cache import fragment_cache, image_cache
+from rank_index import rank_indexes
+from broadcaster import broadcaster, format_sse
+from image_renderer import LEADERBOARD_RENDERER, medal_rows, render_leaderboard_png
+from metrics import CONTENT_TYPE_LATEST, render_metrics, time_render_stage
 import os
+import asyncio
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
 
 router = APIRouter()
 
@@ -29,6 +39,17 @@ if not os.path.exists(TEMPLATES_DIR):
 
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
+# Idle stream heartbeat and the client reconnect delay sent to EventSource
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_RETRY_MS = 3000
+
+# Every read route takes ?guild_id= (the Discord server whose board to show); writes take it in the body
+GuildQuery = Query(DEFAULT_GUILD_ID, min_length=1, max_length=GUILD_ID_MAX_LENGTH)
+
+# Dense ranks that get a medal row on /leaderboard (and the Discord image)
+MEDAL_RANKS = 3
+MEDAL_LABELS = {1: "🥇 Gold", 2: "🥈 Silver", 3: "🥉 Bronze"}
+
 # Add custom template function to ensure HTTPS URLs
 def https_url_for(request: Request, name: str, **kwargs):
     """Generate HTTPS URL for static files"""
@@ -40,23 +61,34 @@ def https_url_for(request: Request, name: str, **kwargs):
 # Add the custom function to template globals
 templates.env.globals['https_url_for'] = https_url_for
 
+async def check_etag(request: Request, response: Response) -> str:
+    """
+    Conditional-request guard for read routes. Declared before the DB dependency so a matching
+    If-None-Match is answered with 304 before any query runs; otherwise the ETag is stamped on the response.
+    Routes that build their own Response must copy the returned ETag onto it. Async, like every reader of
+    the in-memory versions and rank index: those are only updated on the event loop, so reads stay there too.
+    """
+    etag = get_data_etag(request.query_params.get("window", "all"), request.query_params.get("guild_id", DEFAULT_GUILD_ID))
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison: W/"x" and "x" match
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            raise HTTPException(status_code=304, headers=_etag_headers(etag))
+    response.headers.update(_etag_headers(etag))
+    return etag
+
+def _etag_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
 @router.post("/score")
-async def update_score(payload: ScoreUpdate, db: Session = Depends(get_db)):
+async def update_score(payload: ScoreUpdate, db: AsyncSession = Depends(get_write_db)):
     if payload.facet not in FACETS:
         raise HTTPException(status_code=400, detail="Invalid facet")
-    # Ensure the user exists in leaderboard_users
-    from models import User
-    if not db.query(User).filter(User.name == payload.user_id).first():
-        new_user = User(name=payload.user_id)
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-
-    # Use the new database function
-    updated_entry = db_add_score(db, payload)
+
+    # Creates the user if needed and increments the score in one transaction
+    updated_entry = await db_add_score(db, payload)
     
-    # The db_add_score function now returns the Leaderboard SQLAlchemy object.
-    # We can return its details or a specific message.
     return {
         "user_id": updated_entry.user_id,
         "facet": updated_entry.facet,
@@ -64,116 +96,189 @@ async def update_score(payload: ScoreUpdate, db: Session = Depends(get_db)):
         "last_updated": updated_entry.last_updated
     }
 
+@router.post("/scores/batch")
+async def update_scores_batch(payload: ScoreBatch, db: AsyncSession = Depends(get_write_db)):
+    """
+    Applies a list of score updates in one transaction.
+    In all_or_nothing mode any invalid item rejects the whole batch; in best_effort mode
+    invalid items are reported and the rest are applied.
+    """
+    errors = {
+        index: "Invalid facet"
+        for index, item in enumerate(payload.items)
+        if item.facet not in FACETS
+    }
+    if errors and payload.mode == "all_or_nothing":
+        raise HTTPException(
+            status_code=400,
+            detail=[{"index": index, "user_id": payload.items[index].user_id, "facet": payload.items[index].facet, "error": error}
+                    for index, error in errors.items()]
+        )
+
+    valid_items = [item for index, item in enumerate(payload.items) if index not in errors]
+    updated = await db_add_scores(db, payload.guild_id, valid_items) if valid_items else {}
+
+    results = []
+    for index, item in enumerate(payload.items):
+        result = {"index": index, "user_id": item.user_id, "facet": item.facet, "amount": item.amount}
+        if index in errors:
+            result.update({"status": "error", "error": errors[index]})
+        else:
+            row = updated[(item.user_id, item.facet)]
+            result.update({"status": "ok", "score": row.score, "last_updated": row.last_updated})
+        results.append(result)
+
+    return {
+        "mode": payload.mode,
+        "applied": len(valid_items),
+        "failed": len(errors),
+        "results": results
+    }
+
+def _window_cache_key(guild_id: str, window: str) -> Tuple:
+    """
+    Cache key for output derived from one guild's window: changes with every write to the guild and,
+    for day/week/month, every new bucket.
+    """
+    return (guild_id, get_data_version(guild_id), window, bucket_start(window) if window in ROLLUP_PERIODS else None)
+
+async def _leaderboard_fragments(db: AsyncSession, guild_id: str, window: str) -> Tuple[str, str]:
+    """
+    The user and team medal rows as rendered HTML. Only rows within MEDAL_RANKS are fetched and ranked
+    (dense, in Python), and the result is cached per data version, so repeat loads skip the queries and templates.
+    """
+    async def render() -> Tuple[str, str]:
+        # One pivoted query returns totals, team and every facet score per user
+        detailed_leaderboard = await get_leaderboard_with_facets(db, guild_id, FACETS, window, max_rank=MEDAL_RANKS)
+        team_leaderboard = await get_team_leaderboard_data(db, guild_id, window, max_rank=MEDAL_RANKS)
+        user_rows = templates.get_template("leaderboard_user_rows.html").render(
+            rows=medal_rows(detailed_leaderboard, MEDAL_RANKS), medals=MEDAL_LABELS, all_possible_facets=FACETS
+        )
+        team_rows = templates.get_template("leaderboard_team_rows.html").render(
+            rows=medal_rows(team_leaderboard, MEDAL_RANKS), medals=MEDAL_LABELS
+        )
+        return user_rows, team_rows
+
+    fragments, _cache_hit = await fragment_cache.get_or_render(_window_cache_key(guild_id, window), render)
+    return fragments
+
 @router.get("/leaderboard", response_class=HTMLResponse)
-async def get_leaderboard_html(request: Request, db: Session = Depends(get_db)):
-    # Fetches aggregated scores: [{'user_id': 'user1', 'total_score': 100}, ...]
-    leaderboard_summary = db_get_leaderboard_data(db)
-    
-    # To display individual facets as well, we need to fetch them for each user
-    # This can be N+1 queries if not careful. For a small number of users, it might be acceptable.
-    # For larger leaderboards, consider optimizing or changing the display format.
-    detailed_leaderboard = []
-    for summary_item in leaderboard_summary:
-        user_id = summary_item["user_id"]
-        total_score = summary_item["total_score"]
-        team_name = summary_item["team_name"]  # Include team_name from the database query
-        facet_scores_list = get_all_scores_by_user(db, user_id)
-        # Convert list of facet scores to a dict for easier template access
-        facets_for_user = {item["facet"]: item["score"] for item in facet_scores_list}
-        detailed_leaderboard.append({
-            "user_id": user_id,
-            "total_score": total_score,
-            "team_name": team_name,  # Include team_name in the detailed leaderboard
-            "facets": facets_for_user
-        })
-
-    # Fetch team leaderboard data
-    team_leaderboard = get_team_leaderboard_data(db)
+async def get_leaderboard_html(request: Request, window: LeaderboardWindow = "all", guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
+    user_rows, team_rows = await _leaderboard_fragments(db, guild_id, window)
 
     return templates.TemplateResponse(
         "leaderboard.html", 
         {
             "request": request, 
-            "leaderboard": detailed_leaderboard, # Pass the detailed structure
-            "team_leaderboard": team_leaderboard, # Pass the team leaderboard data
-            "all_possible_facets": FACETS # Pass all possible facets for consistent column rendering
-        }
+            "user_rows": user_rows,
+            "team_rows": team_rows,
+            "all_possible_facets": FACETS, # Pass all possible facets for consistent column rendering
+            "etag": etag, # Lets the live-update stream detect a page rendered from older data
+            "window": window,
+            "guild_id": guild_id
+        },
+        headers=_etag_headers(etag)
     )
 
 @router.get("/leaderboard/discord")
-async def get_leaderboard_discord(request: Request, db: Session = Depends(get_db)): # Added db session
+async def get_leaderboard_discord(request: Request, window: LeaderboardWindow = "all", guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)): # Added db session
     # Construct absolute URL for Playwright to access
     # If API ingress is restricted to internal, Playwright (running in the same container)
     # should access via localhost.
     # The port is the one Uvicorn listens on inside the container.
-    leaderboard_html_url = "http://localhost:8000/leaderboard" 
+    leaderboard_html_url = f"http://localhost:8000/leaderboard?{urlencode({'window': window, 'guild_id': guild_id})}"
     # print(f"Playwright attempting to screenshot internal URL: {leaderboard_html_url}")
 
-    async with async_playwright() as p:
-        # browser = await p.chromium.launch() # Default, might need args in Docker
-        browser = await p.chromium.launch(args=["--no-sandbox", "--disable-setuid-sandbox"]) # Common for Docker
-        page = await browser.new_page()
-        try:
-            await page.goto(leaderboard_html_url, wait_until="networkidle") # wait_until can be helpful
-            # Wait for a specific element that indicates the leaderboard is loaded.
-            # Adjust selector if your table or a key element has a specific ID or class.
-            await page.wait_for_selector('table.leaderboard-table', timeout=15000) # Example selector, increased timeout
-            screenshot_bytes = await page.screenshot(type="png", full_page=True) # full_page might be useful
-        except Exception as e:
-            print(f"Playwright error: {e}")
-            await browser.close()
-            raise HTTPException(status_code=500, detail=f"Failed to generate leaderboard image: {e}")
-        await browser.close()
-
-    # MODIFIED SECTION FOR TEMP FILE HANDLING AND CLEANUP
-    # import tempfile # Already imported at the top
-    # import os # Already imported at the top
-    from starlette.background import BackgroundTask
-
-    # Create a temporary file
-    # delete=False is important because FileResponse will open it by path.
-    # We will delete it manually with a background task.
-    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    tmp_file.write(screenshot_bytes)
-    tmp_file_path = tmp_file.name
-    tmp_file.close() # Close the file handle, FileResponse will reopen by path
-
-    # Define a cleanup function
-    def cleanup_temp_file(path: str):
-        try:
-            os.remove(path)
-            print(f"Successfully removed temp file: {path}")
-        except Exception as e:
-            print(f"Error removing temp file {path}: {e}")
+    async def render() -> bytes:
+        if LEADERBOARD_RENDERER == "pillow":
+            # Draws the tables natively from the DB data, no browser involved
+            detailed_leaderboard = await get_leaderboard_with_facets(db, guild_id, FACETS, window, max_rank=MEDAL_RANKS)
+            team_leaderboard = await get_team_leaderboard_data(db, guild_id, window, max_rank=MEDAL_RANKS)
+            if render_workers.enabled:
+                return await render_workers.render("pillow", (detailed_leaderboard, team_leaderboard, FACETS, window))
+            with time_render_stage("draw"):
+                return await run_in_threadpool(render_leaderboard_png, detailed_leaderboard, team_leaderboard, FACETS, window)
+        if render_workers.enabled:
+            # Queued to a render worker process, which screenshots the page on its own warm browser
+            return await render_workers.render("playwright", leaderboard_html_url)
+        # Renders on a warm page from the in-process pool started in main.lifespan
+        return await browser_pool.render(leaderboard_html_url)
 
-    return FileResponse(
-        tmp_file_path,
+    try:
+        # The image only changes when a write bumps the data version, so unchanged boards come straight from memory
+        # (windowed images also roll over with their bucket)
+        cache_key = (LEADERBOARD_RENDERER, *_window_cache_key(guild_id, window))
+        screenshot_bytes, cache_hit = await image_cache.get_or_render(cache_key, render)
+    except Exception as e:
+        print(f"Render error ({LEADERBOARD_RENDERER}): {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate leaderboard image: {e}")
+
+    return Response(
+        content=screenshot_bytes,
         media_type="image/png",
-        filename="leaderboard.png",
-        background=BackgroundTask(cleanup_temp_file, path=tmp_file_path)
+        headers={
+            "Content-Disposition": 'attachment; filename="leaderboard.png"',
+            "X-Cache": "HIT" if cache_hit else "MISS",
+            "X-Cache-Hits": str(image_cache.hits),
+            "X-Cache-Misses": str(image_cache.misses),
+            **_etag_headers(etag),
+        }
+    )
+
+@router.get("/leaderboard/discord/cache", response_class=JSONResponse)
+def get_leaderboard_image_cache_stats(guild_id: str = GuildQuery):
+    """Hit/miss counters for the rendered leaderboard image cache (shared by every guild), with the guild's data version."""
+    return {"data_version": get_data_version(guild_id), **image_cache.stats()}
+
+@router.get("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint: route latency, in-flight requests, DB query/pool and render timings."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@router.get("/leaderboard/stream")
+async def stream_leaderboard(request: Request, guild_id: str = GuildQuery):
+    """
+    Server-Sent Events feed of a guild's leaderboard deltas, fanned out from the shared broadcaster.
+    Starts with a "hello" carrying the current ETag so a page rendered from older data can reload.
+    """
+    queue = broadcaster.subscribe(guild_id)
+
+    async def events():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n"
+            yield format_sse("hello", {"etag": get_data_etag(guild_id=guild_id)})
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # Keeps proxies from closing an idle stream
+        finally:
+            broadcaster.unsubscribe(guild_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 @router.post("/create_team")
-def create_team(team_data: TeamCreate, db: Session = Depends(get_db)):
+async def create_team(team_data: TeamCreate, db: AsyncSession = Depends(get_write_db)):
     """
     Creates a new team.
     """
-    # This import is needed here to avoid circular dependency issues with models
-    from models import Team
-    
-    existing_team = db.query(Team).filter(Team.name == team_data.name).first()
+    existing_team = await get_team_by_name(db, team_data.guild_id, team_data.name)
     if existing_team:
         raise HTTPException(status_code=400, detail=f"Team '{team_data.name}' already exists.")
         
-    new_team = add_team(db, team_name=team_data.name)
+    new_team = await add_team(db, team_data.guild_id, team_name=team_data.name)
     return {"id": new_team.id, "name": new_team.name}
 
 @router.post("/assign_user_to_team")
-def assign_user_to_team(assignment: UserTeamAssign, db: Session = Depends(get_db)):
+async def assign_user_to_team(assignment: UserTeamAssign, db: AsyncSession = Depends(get_write_db)):
     """
     Assigns a user to a team. Creates the user if they don't exist.
     """
-    updated_user = add_user_to_team(db, user_name=assignment.user_name, team_name=assignment.team_name)
+    updated_user = await add_user_to_team(db, assignment.guild_id, user_name=assignment.user_name, team_name=assignment.team_name)
     
     if not updated_user:
         raise HTTPException(status_code=404, detail=f"Team '{assignment.team_name}' not found.")
@@ -184,71 +289,174 @@ def assign_user_to_team(assignment: UserTeamAssign, db: Session = Depends(get_db
     }
 
 @router.get("/get_users", response_class=JSONResponse)
-def get_users_route(db: Session = Depends(get_db)):
-    users = get_all_users(db)
+async def get_users_route(guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
+    users = await get_all_users(db, guild_id)
     return [user.name for user in users]
 
 @router.get("/get_teams", response_class=JSONResponse)
-def get_teams_route(db: Session = Depends(get_db)):
-    teams = get_all_teams(db)
+async def get_teams_route(guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
+    teams = await get_all_teams(db, guild_id)
     return [team.name for team in teams]
 
 @router.get("/users", response_class=HTMLResponse)
-async def get_users_page(request: Request, db: Session = Depends(get_db)):
-    users = get_all_users(db)
-    teams = get_all_teams(db)
-    return templates.TemplateResponse("users.html", {"request": request, "users": users, "teams": teams})
+async def get_users_page(request: Request, guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
+    users = await get_all_users(db, guild_id)
+    teams = await get_all_teams(db, guild_id)
+    return templates.TemplateResponse(
+        "users.html",
+        {"request": request, "users": users, "teams": teams, "guild_id": guild_id},
+        headers=_etag_headers(etag)
+    )
 
 @router.get("/teams", response_class=HTMLResponse)
-async def get_teams_page(request: Request):
-    return templates.TemplateResponse("teams.html", {"request": request})
+async def get_teams_page(request: Request, guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
+    teams = await get_team_breakdowns(db, guild_id)
+    return templates.TemplateResponse(
+        "teams.html",
+        {"request": request, "teams": teams, "all_possible_facets": FACETS, "guild_id": guild_id},
+        headers=_etag_headers(etag)
+    )
 
 @router.get("/get_user_scores/{user_id}", response_class=JSONResponse)
-def get_user_scores_route(user_id: str, db: Session = Depends(get_db)):
+async def get_user_scores_route(user_id: str, guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
     """Get all facet scores for a specific user."""
-    user_scores = get_all_scores_by_user(db, user_id)
+    user_scores = await get_all_scores_by_user(db, guild_id, user_id)
     if not user_scores:
         raise HTTPException(status_code=404, detail=f"No scores found for user '{user_id}'")
     return user_scores
 
 @router.get("/get_team_scores/{team_name}", response_class=JSONResponse)
-def get_team_scores_route(team_name: str, db: Session = Depends(get_db)):
+async def get_team_scores_route(team_name: str, guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
     """Get aggregated scores for a specific team."""
-    from models import Team, User
-    
-    # Find the team
-    team = db.query(Team).filter(Team.name == team_name).first()
-    if not team:
+    # Team total, facet totals and members come from one grouped query
+    breakdowns = await get_team_breakdowns(db, guild_id, [team_name])
+    if not breakdowns:
         raise HTTPException(status_code=404, detail=f"Team '{team_name}' not found")
-    
-    # Get all team members
-    team_members = db.query(User).filter(User.group_id == team.id).all()
-    member_names = [member.name for member in team_members]
-    
-    if not team_members:
+    team = breakdowns[0]
+    if not team["members"]:
         raise HTTPException(status_code=404, detail=f"Team '{team_name}' has no members")
-    
-    # Aggregate scores by facet for all team members
-    facet_totals = {}
-    total_score = 0
-    
-    for member in team_members:
-        member_scores = get_all_scores_by_user(db, str(member.name))
-        for score_data in member_scores:
-            facet = score_data['facet']
-            score = score_data['score']
-            facet_totals[facet] = facet_totals.get(facet, 0) + score
-            total_score += score
-    
-    return {
-        "team_name": team_name,
-        "total_score": total_score,
-        "facet_scores": facet_totals,
-        "members": member_names
-    }
+    return team
+
+@router.get("/get_teams_scores", response_class=JSONResponse)
+async def get_teams_scores_route(
+    team_name: Optional[List[str]] = Query(None),
+    guild_id: str = GuildQuery,
+    etag: str = Depends(check_etag),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Aggregated scores for many teams at once (repeat team_name=...; all teams if omitted),
+    in the same shape as /get_team_scores. Unknown team names are skipped.
+    """
+    return await get_team_breakdowns(db, guild_id, team_name)
 
 @router.get("/get_all_users_with_scores", response_class=JSONResponse)
-def get_all_users_with_scores_route(db: Session = Depends(get_db)):
-    """Get all users with their total scores, ordered by score descending."""
-    users_with_scores = get_all_users_with_scores(db)
+async def get_all_users_with_scores_route(window: LeaderboardWindow = "all", guild_id: str = GuildQuery, etag: str = Depends(check_etag), db: AsyncSession = Depends(get_read_db)):
+    """
+    Get all users with their total scores (and per-facet scores), ordered by score descending.
+    window=day|week|month limits the scores to the current UTC day, ISO week or month.
+    """
+    users_with_scores = await get_leaderboard_with_facets(db, guild_id, FACETS, window)
+    for user in users_with_scores:
+        user["team_name"] = user["team_name"] if user["team_name"] else "No Team"
     return users_with_scores
+
+def _encode_cursor(total_score: int, user_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([total_score, user_id]).encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        total_score, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(total_score), str(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/get_users_with_scores_page", response_class=JSONResponse)
+async def get_users_with_scores_page_route(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    guild_id: str = GuildQuery,
+    etag: str = Depends(check_etag),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    One page of users ordered by total score, keyset-paginated on (total_score, user_id).
+    Pass next_cursor from the previous response as cursor to get the following page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    # One extra row tells whether another page exists, so a full last page gets no cursor to an empty one
+    users = await get_users_with_scores_page(db, guild_id, limit=limit + 1, after=after)
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        last = users[-1]
+        next_cursor = _encode_cursor(last["total_score"], last["user_id"])
+    return {
+        "users": users,
+        "next_cursor": next_cursor,
+        "total_users": len(rank_indexes.get(guild_id)) # Counted from the in-memory index, no COUNT(*) per page
+    }
+
+# DataTables page sizes offered by /leaderboard/all; the server never returns more than the largest
+TABLE_MAX_PAGE_SIZE = 100
+
+@router.get("/leaderboard/all", response_class=HTMLResponse)
+async def get_full_leaderboard_page(request: Request, guild_id: str = GuildQuery):
+    """Every user's scores in a DataTables view whose rows are fetched page by page from /leaderboard/table."""
+    return templates.TemplateResponse(
+        "leaderboard_all.html",
+        {"request": request, "all_possible_facets": FACETS, "page_sizes": [10, 25, 50, TABLE_MAX_PAGE_SIZE], "guild_id": guild_id}
+    )
+
+@router.get("/leaderboard/table", response_class=JSONResponse)
+async def get_leaderboard_table(
+    request: Request,
+    draw: int = 0,
+    start: int = Query(0, ge=0),
+    length: int = Query(25, ge=1, le=TABLE_MAX_PAGE_SIZE),
+    search: str = Query("", alias="search[value]", max_length=100),
+    order_column: int = Query(-1, alias="order[0][column]"),
+    order_dir: str = Query("desc", alias="order[0][dir]"),
+    guild_id: str = GuildQuery,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    DataTables server-side processing endpoint (https://datatables.net/manual/server-side) for the full board.
+    Orderable columns are user_id, team_name, total_score and facets.<facet>; search prefix-matches user or team.
+    No ETag: every response echoes the request's draw counter, so it is never reusable as-is.
+    """
+    # The ordered column's name comes from the columns[i][data] the client declared
+    column = request.query_params.get(f"columns[{order_column}][data]", "total_score")
+    order_by = column.removeprefix("facets.") if column.startswith("facets.") else column
+    if order_by not in FACETS and order_by not in ("user_id", "team_name", "total_score"):
+        order_by = "total_score"
+
+    filtered, rows = await get_users_table_page(
+        db, guild_id, FACETS, offset=start, limit=length, order_by=order_by,
+        descending=order_dir.lower() != "asc", search=search.strip() or None
+    )
+    rank_index = rank_indexes.get(guild_id)
+    total = len(rank_index) # Counted from the in-memory index, no COUNT(*) per page
+    for row in rows:
+        row["rank"] = rank_index.dense_rank_of_score(row["total_score"])
+        row["team_name"] = row["team_name"] if row["team_name"] else "No Team"
+    return {
+        "draw": draw,
+        "recordsTotal": total,
+        "recordsFiltered": total if filtered is None else filtered,
+        "data": rows
+    }
+
+# Async so the skiplist is read on the event loop thread that updates it, never mid-update from the threadpool
+@router.get("/rank/{user_id}", response_class=JSONResponse)
+async def get_user_rank_route(user_id: str, guild_id: str = GuildQuery, etag: str = Depends(check_etag)):
+    """Dense rank of a user by total score within the guild, served from the in-memory rank index."""
+    rank = rank_indexes.get(guild_id).rank_of(user_id)
+    if rank is None:
+        raise HTTPException(status_code=404, detail=f"No scores found for user '{user_id}'")
+    return rank
+
+@router.get("/top/{k}", response_class=JSONResponse)
+async def get_top_route(k: int = Path(..., ge=1, le=1000), guild_id: str = GuildQuery, etag: str = Depends(check_etag)):
+    """The guild's users holding the top k distinct totals (ties share a rank, like the medal table)."""
+    return rank_indexes.get(guild_id).top(k)
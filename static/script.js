@@ -1,7 +1,15 @@
 $(document).ready(function () {
+    // Pages show one Discord server's board; every API call they make is scoped to the same guild
+    const guildId = document.body.dataset.guild;
+    function guildUrl(path) {
+        return guildId ? `${path}${path.includes('?') ? '&' : '?'}guild_id=${encodeURIComponent(guildId)}` : path;
+    }
+
     // Only initialize DataTables if the library is loaded and the element exists
+    let leaderboardTable = null;
+    let teamLeaderboardTable = null;
     if (typeof $.fn.DataTable !== 'undefined' && $('#leaderboard').length) {
-        $('#leaderboard').DataTable({
+        leaderboardTable = $('#leaderboard').DataTable({
             "pageLength": 10, // Default number of rows
             "lengthMenu": [ [10, 25, 50, -1], [10, 25, 50, "All"] ] // Rows per page options
         });
@@ -9,16 +17,133 @@ $(document).ready(function () {
 
     // Initialize DataTables for the team leaderboard
     if (typeof $.fn.DataTable !== 'undefined' && $('#teamLeaderboard').length) {
-        $('#teamLeaderboard').DataTable({
+        teamLeaderboardTable = $('#teamLeaderboard').DataTable({
             "pageLength": 10, // Default number of rows
             "lengthMenu": [ [10, 25, 50, -1], [10, 25, 50, "All"] ] // Rows per page options
         });
     }
 
+    // Live updates: patch the medal tables in place from the /leaderboard/stream delta feed
+    const MEDALS = {1: '🥇 Gold', 2: '🥈 Silver', 3: '🥉 Bronze'};
+
+    function makeRow(attribute, value, cells) {
+        const tr = document.createElement('tr');
+        tr.dataset[attribute] = value;
+        cells.forEach(([className, facet, text]) => {
+            const td = document.createElement('td');
+            if (className) td.className = className;
+            if (facet) td.dataset.facet = facet;
+            td.textContent = text;
+            tr.appendChild(td);
+        });
+        return tr;
+    }
+
+    function findRow(table, attribute, value) {
+        const rows = table.rows((index, data, node) => node.dataset[attribute] === value);
+        return rows.count() ? table.row(rows.indexes()[0]) : null;
+    }
+
+    function setCell(table, row, selector, value) {
+        const td = row.node().querySelector(selector);
+        if (td) table.cell(td).data(value);
+    }
+
+    async function fillUserFacets(table, row, userId) {
+        // A user who just entered the medal ranks: the delta only carries the facets that changed
+        try {
+            const response = await fetch(guildUrl(`/get_user_scores/${encodeURIComponent(userId)}`));
+            if (!response.ok) return;
+            const scores = await response.json();
+            scores.forEach(({facet, score}) => setCell(table, row, `td[data-facet="${facet}"]`, score));
+            table.draw(false);
+        } catch (error) {
+            console.error('Error fetching user scores:', error);
+        }
+    }
+
+    function applyUserDelta(top, users) {
+        const table = leaderboardTable;
+        const facetNames = $('#leaderboard thead th[data-facet]').map((_, th) => th.dataset.facet).get();
+        const changed = new Map(users.map(user => [user.user_id, user]));
+        const topIds = new Set(top.map(entry => entry.user_id));
+
+        // Rows that dropped out of the medal ranks
+        table.rows((index, data, node) => !topIds.has(node.dataset.userId)).remove();
+
+        for (const entry of top) {
+            const user = changed.get(entry.user_id);
+            let row = findRow(table, 'userId', entry.user_id);
+            if (!row) {
+                if (!user) {
+                    // Someone we hold no data for moved up without scoring (e.g. a negative award): start over
+                    window.location.reload();
+                    return;
+                }
+                row = table.row.add(makeRow('userId', entry.user_id, [
+                    ['medal', null, ''],
+                    [null, null, entry.user_id],
+                    ['team-name', null, 'N/A'],
+                    ['total-score', null, entry.total_score],
+                    ...facetNames.map(facet => [null, facet, 0])
+                ]));
+                fillUserFacets(table, row, entry.user_id);
+            }
+            setCell(table, row, 'td.medal', MEDALS[entry.rank]);
+            setCell(table, row, 'td.total-score', entry.total_score);
+            if (user) {
+                setCell(table, row, 'td.team-name', user.team_name || 'N/A');
+                Object.entries(user.facets).forEach(([facet, score]) => setCell(table, row, `td[data-facet="${facet}"]`, score));
+            }
+        }
+        table.draw(false);
+    }
+
+    function applyTeamMedals(teams) {
+        // The delta carries the whole (small) team medal table, so it is simply replaced
+        const table = teamLeaderboardTable;
+        const totals = [...new Set(teams.map(team => team.total_score))];
+        table.clear();
+        teams.forEach(team => table.row.add(makeRow('teamName', team.team_name, [
+            ['medal', null, MEDALS[totals.indexOf(team.total_score) + 1]],
+            [null, null, team.team_name],
+            ['total-score', null, team.total_score]
+        ])));
+        table.draw(false);
+    }
+
+    // Deltas carry all-time totals, so windowed boards (?window=week etc.) are not live-patched
+    if (window.EventSource && leaderboardTable && teamLeaderboardTable && document.body.dataset.window === 'all') {
+        const stream = new EventSource(guildUrl('/leaderboard/stream'));
+        const onDelta = (handler) => (event) => {
+            const delta = JSON.parse(event.data);
+            document.body.dataset.etag = delta.etag;
+            handler(delta);
+        };
+
+        // After a (re)connect, reload if anything changed that this page never saw
+        stream.addEventListener('hello', (event) => {
+            if (JSON.parse(event.data).etag !== document.body.dataset.etag) window.location.reload();
+        });
+        stream.addEventListener('scores', onDelta((delta) => {
+            applyUserDelta(delta.top, delta.users);
+            if (delta.teams) applyTeamMedals(delta.teams);
+        }));
+        stream.addEventListener('team_assignment', onDelta((delta) => {
+            const row = findRow(leaderboardTable, 'userId', delta.user_id);
+            if (row) {
+                setCell(leaderboardTable, row, 'td.team-name', delta.team_name);
+                leaderboardTable.draw(false);
+            }
+            if (delta.teams) applyTeamMedals(delta.teams);
+        }));
+        stream.addEventListener('resync', () => window.location.reload());
+    }
+
     // Function to populate the team dropdown
     async function populateTeamDropdown() {
         try {
-            const response = await fetch('/get_teams');
+            const response = await fetch(guildUrl('/get_teams'));
             const teams = await response.json();
             const teamSelect = document.getElementById('teamName');
             
@@ -75,7 +200,7 @@ $(document).ready(function () {
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ name: teamName }),
+                    body: JSON.stringify({ name: teamName, guild_id: guildId }),
                 });
 
                 const result = await response.json();
@@ -128,7 +253,7 @@ $(document).ready(function () {
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ user_name: userName, team_name: teamName }),
+                    body: JSON.stringify({ user_name: userName, team_name: teamName, guild_id: guildId }),
                 });
 
                 const result = await response.json();
@@ -150,6 +275,36 @@ $(document).ready(function () {
         });
     }
 
+    // Initialize DataTables for the teams overview, highest total first
+    if (typeof $.fn.DataTable !== 'undefined' && $('#teamsOverview').length) {
+        $('#teamsOverview').DataTable({
+            "order": [[1, "desc"]],
+            "pageLength": 10,
+            "lengthMenu": [ [10, 25, 50, -1], [10, 25, 50, "All"] ]
+        });
+    }
+
+    // Full leaderboard: server-side processing, so only the visible page is fetched and drawn
+    if (typeof $.fn.DataTable !== 'undefined' && $('#fullLeaderboard').length) {
+        const fullLeaderboard = $('#fullLeaderboard');
+        const columns = fullLeaderboard.find('thead th').map(function () {
+            const data = $(this).data('column');
+            // render.text() escapes names, which are user-supplied and would otherwise be inserted as HTML
+            return {"data": data, "orderable": data !== 'rank', "render": DataTable.render.text()}; // Rank follows the total column
+        }).get();
+        fullLeaderboard.DataTable({
+            "serverSide": true,
+            "processing": true,
+            "ajax": fullLeaderboard.data('source'),
+            "columns": columns,
+            "order": [[3, "desc"]],
+            "searchDelay": 400,
+            "pageLength": 25,
+            "lengthMenu": fullLeaderboard.data('page-sizes'),
+            "language": {"searchPlaceholder": "User or team starts with..."}
+        });
+    }
+
     // Initialize DataTables for the users table
     if (typeof $.fn.DataTable !== 'undefined' && $('#usersTable').length) {
         $('#usersTable').DataTable();
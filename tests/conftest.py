@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+
+# models.py builds its engines at import time, so the test database has to be configured first
+_db_dir = tempfile.mkdtemp(prefix="leaderboard-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'test.db')}")
+os.environ.setdefault("RENDER_WORKERS", "0")
+os.environ.setdefault("LEADERBOARD_RENDERER", "pillow")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import models
+from image_cache import fragment_cache, image_cache
+from main import app
+
+
+@pytest.fixture
+def empty_db():
+    """Recreates every table (the app's lifespan only creates the derived ones) and drops cached renders."""
+    models.Base.metadata.drop_all(models.engine)
+    models.Base.metadata.create_all(models.engine)
+    image_cache.clear()
+    fragment_cache.clear()
+
+
+@pytest.fixture
+def client(empty_db):
+    """An API client over an empty database."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def run_db(empty_db):
+    """Runs an async function with a session outside the app, e.g. run_db(lambda db: add_score(db, update))."""
+    def run(query):
+        async def with_session():
+            try:
+                async with models.AsyncSessionLocal() as db:
+                    return await query(db)
+            finally:
+                # Pooled connections belong to this event loop
+                await models.async_engine.dispose()
+        return asyncio.run(with_session())
+    return run
+
+
+@pytest.fixture
+def postgres_url():
+    """
+    TEST_POSTGRES_URL (e.g. postgresql://postgres@127.0.0.1:5432/leaderboard_test) with every table recreated
+    empty; tests that need PostgreSQL's concurrency or LISTEN/NOTIFY are skipped without it.
+    """
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def run_postgres(postgres_url):
+    """Like run_db, but the async function gets a sessionmaker for the PostgreSQL database (for concurrent sessions)."""
+    def run(query):
+        async def with_sessions():
+            engine = create_async_engine(models.async_url(postgres_url), pool_size=20)
+            try:
+                return await query(async_sessionmaker(engine, autoflush=False, expire_on_commit=False))
+            finally:
+                await engine.dispose()
+        return asyncio.run(with_sessions())
+    return run
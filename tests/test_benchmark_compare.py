@@ -0,0 +1,30 @@
+from benchmarks.suite import compare_reports
+
+
+def _report(commit, results):
+    return {"commit": commit, "timestamp": "2026-01-01T00:00:00Z", "results": results}
+
+
+def _run(p50, p95, p99, rps):
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "throughput_rps": rps}
+
+
+def test_compare_lists_percentile_and_throughput_changes():
+    before = _report("aaa", {"leaderboard": {"10": _run(10, 20, 40, 100)}})
+    after = _report("bbb", {"leaderboard": {"10": _run(5, 25, 40, 150)}})
+
+    rows = {tuple(line.split()[:3]): line.split()[-1] for line in compare_reports(before, after).splitlines()[4:]}
+
+    assert rows == {
+        ("leaderboard", "10", "p50_ms"): "-50.0%",
+        ("leaderboard", "10", "p95_ms"): "+25.0%",
+        ("leaderboard", "10", "p99_ms"): "+0.0%",
+        ("leaderboard", "10", "throughput_rps"): "+50.0%",
+    }
+
+
+def test_compare_skips_runs_missing_from_either_report():
+    before = _report("aaa", {"team_scores": {"10": {"skipped": "no teams"}}, "score": {"50": _run(1, 2, 3, 4)}})
+    after = _report("bbb", {"team_scores": {"10": _run(1, 1, 1, 1)}, "score": {"10": _run(1, 2, 3, 4)}})
+
+    assert compare_reports(before, after).splitlines()[4:] == []
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+
+import pytest
+
+# bot.py refuses to import without its settings; nothing here connects to Discord or the API
+os.environ.setdefault("LEADERBOARDBOT_TOKEN", "test-token")
+os.environ.setdefault("API_BASE_URL", "http://127.0.0.1:9")
+
+import bot
+from bot import TeamIndex, TeamIndexes
+
+
+class FakeApi:
+    """Answers every call with response (an exception instance is raised instead)."""
+    def __init__(self, response):
+        self.response = response
+
+    async def get(self, path, **kwargs):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def test_background_refresh_is_kept_and_its_failure_logged(caplog):
+    async def main():
+        index = TeamIndex()
+        index.refresh_in_background(FakeApi(ValueError("bad body")))
+        task = index._refresh_task
+        assert task is not None
+        index.refresh_in_background(FakeApi((200, ["Owls"]))) # Already running: not started twice
+        assert index._refresh_task is task
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0) # Done callbacks run on the next loop iteration
+        return index
+
+    with caplog.at_level(logging.ERROR, logger="discord"):
+        index = asyncio.run(main())
+    assert not index.loaded
+    assert any("team-index-refresh" in record.getMessage() and record.exc_info for record in caplog.records)
+
+
+def test_refresh_loop_survives_unexpected_errors(monkeypatch, caplog):
+    monkeypatch.setattr(bot, "TEAM_INDEX_TTL_SECONDS", 0)
+    indexes = TeamIndexes()
+    broken, healthy = TeamIndex({"guild_id": "1"}), TeamIndex({"guild_id": "2"})
+    indexes._indexes = {"1": broken, "2": healthy}
+
+    class PerGuildApi:
+        calls = 0
+
+        async def get(self, path, params=None, **kwargs):
+            PerGuildApi.calls += 1
+            if params["guild_id"] == "1":
+                raise KeyError("unexpected payload")
+            return 200, ["Owls"]
+
+    async def main():
+        loop_task = asyncio.create_task(indexes.refresh_loop(PerGuildApi()))
+        while PerGuildApi.calls < 6: # Three rounds over both guilds
+            await asyncio.sleep(0)
+        assert not loop_task.done()
+        loop_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await loop_task
+
+    with caplog.at_level(logging.ERROR, logger="discord"):
+        asyncio.run(main())
+    assert healthy.teams == ["Owls"]
+    assert any("Unexpected error refreshing team index" in record.getMessage() for record in caplog.records)
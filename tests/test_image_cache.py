@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from image_cache import ImageCache
+
+
+def test_concurrent_misses_share_one_render():
+    renders = []
+
+    async def render():
+        renders.append(1)
+        await asyncio.sleep(0.01)
+        return b"png"
+
+    async def main():
+        cache = ImageCache()
+        return await asyncio.gather(*(cache.get_or_render("key", render) for _ in range(5))), cache
+
+    results, cache = asyncio.run(main())
+    assert renders == [1]
+    assert sorted(hit for _, hit in results) == [False] * 5
+    assert cache.get("key") == b"png"
+
+
+def test_waiters_take_over_when_the_render_is_cancelled():
+    async def main():
+        cache = ImageCache()
+        first_started = asyncio.Event()
+
+        async def slow_render():
+            first_started.set()
+            await asyncio.sleep(10)
+            return b"never"
+
+        async def fast_render():
+            return b"png"
+
+        leader = asyncio.create_task(cache.get_or_render("key", slow_render))
+        await first_started.wait()
+        waiter = asyncio.create_task(cache.get_or_render("key", fast_render))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        result = await asyncio.wait_for(waiter, timeout=1)
+        return result, cache
+
+    (image, hit), cache = asyncio.run(main())
+    assert (image, hit) == (b"png", False)
+    assert cache._pending == {}
+
+
+def test_cancelled_waiter_does_not_disturb_the_render():
+    async def main():
+        cache = ImageCache()
+        release = asyncio.Event()
+
+        async def render():
+            await release.wait()
+            return b"png"
+
+        leader = asyncio.create_task(cache.get_or_render("key", render))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_render("key", render))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        release.set()
+        return await asyncio.wait_for(leader, timeout=1)
+
+    assert asyncio.run(main()) == (b"png", False)
+
+
+def test_failed_render_is_raised_to_every_waiter_and_not_cached():
+    async def render():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        cache = ImageCache()
+        results = await asyncio.gather(*(cache.get_or_render("key", render) for _ in range(3)), return_exceptions=True)
+        return results, cache
+
+    results, cache = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("key") is None and cache._pending == {}
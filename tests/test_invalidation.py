@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import asyncpg
+import httpx
+import pytest
+from sqlalchemy import create_engine, text
+
+import database
+import models
+from database import apply_remote_change, get_data_etag, get_data_version
+
+REPO_DIR = Path(__file__).parent.parent
+
+
+def test_remote_versions_only_move_forward():
+    guild = "versions-forward"
+    asyncio.run(apply_remote_change({"origin": "other", "kind": "teams", "guild_id": guild, "version": 5}))
+    tag = get_data_etag(guild_id=guild)
+    asyncio.run(apply_remote_change({"origin": "other", "kind": "teams", "guild_id": guild, "version": 3}))
+    assert get_data_version(guild) == database._data_version + 5
+    assert get_data_etag(guild_id=guild) == tag
+
+
+def test_own_notifications_are_ignored():
+    guild = "versions-own"
+    asyncio.run(apply_remote_change({"origin": database._worker_id, "kind": "teams", "guild_id": guild, "version": 7}))
+    assert get_data_version(guild) == database._data_version
+
+
+def test_remote_changes_keep_reads_on_primary(monkeypatch):
+    # The replica may not have another worker's write yet, so reads must not be cached under its version
+    replica = object()
+    monkeypatch.setattr(database, "ReadSessionLocal", replica)
+    monkeypatch.setattr(database, "_last_write_at", float("-inf"))
+    assert database.read_session_factory() is replica
+    asyncio.run(apply_remote_change({"origin": "other", "kind": "teams", "guild_id": "versions-replica", "version": 1}))
+    assert database.read_session_factory() is models.AsyncSessionLocal
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_worker(database_url: str, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "RENDER_WORKERS": "0",
+        "LEADERBOARD_RENDERER": "pillow",
+        "READ_REPLICA_DATABASE_URL": "",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def _wait_until(predicate, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+def _wait_until_listening(database_url: str, process: subprocess.Popen):
+    """Waits for the worker's invalidation listener (named after its pid) to hold its LISTEN connection."""
+    engine = create_engine(database_url)
+    try:
+        def listening() -> bool:
+            with engine.connect() as conn:
+                return conn.execute(
+                    text("SELECT count(*) FROM pg_stat_activity WHERE application_name = :name"),
+                    {"name": f"leaderboard-invalidation:{process.pid}"}
+                ).scalar_one() > 0
+        _wait_until(listening)
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def workers(postgres_url):
+    """Two API workers (separate processes, as under uvicorn --workers) sharing an empty PostgreSQL database."""
+    ports = [_free_port(), _free_port()]
+    processes = [_start_worker(postgres_url, port) for port in ports]
+    clients = [httpx.Client(base_url=f"http://127.0.0.1:{port}") for port in ports]
+    try:
+        for client, process in zip(clients, processes):
+            _wait_until(lambda: client.get("/top/1").status_code == 200)
+            _wait_until_listening(postgres_url, process)
+        yield clients
+    finally:
+        for client in clients:
+            client.close()
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def _stored_version(database_url: str, guild_id: str = models.DEFAULT_GUILD_ID) -> int:
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT version FROM leaderboard_data_versions WHERE guild_id = :guild_id"), {"guild_id": guild_id}
+            ).scalar_one()
+    finally:
+        engine.dispose()
+
+
+def test_workers_agree_on_etags(postgres_url, workers):
+    writer, reader = workers
+    assert writer.post("/score", json={"user_id": "alice#0001", "facet": "bonus", "amount": 3}).status_code == 200
+    etag = writer.get("/leaderboard").headers["ETag"]
+
+    # The other worker adopts the committed version from the notification instead of counting its own
+    _wait_until(lambda: reader.get("/leaderboard").headers["ETag"] == etag, timeout=5)
+    assert reader.get("/leaderboard", headers={"If-None-Match": etag}).status_code == 304
+    assert reader.get("/leaderboard/discord/cache").json()["data_version"] == _stored_version(postgres_url)
+
+
+def test_restarted_worker_keeps_etags(postgres_url, workers):
+    writer, _ = workers
+    writer.post("/score", json={"user_id": "alice#0001", "facet": "bonus", "amount": 3})
+    etag = writer.get("/leaderboard").headers["ETag"]
+
+    port = _free_port()
+    process = _start_worker(postgres_url, port)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as fresh:
+            _wait_until(lambda: fresh.get("/top/1").status_code == 200)
+            _wait_until_listening(postgres_url, process)
+            assert fresh.get("/leaderboard", headers={"If-None-Match": etag}).status_code == 304
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def test_notification_carries_committed_version(postgres_url, workers):
+    writer, _ = workers
+
+    async def notified_change():
+        connection = await asyncpg.connect(postgres_url)
+        payloads: "asyncio.Queue[str]" = asyncio.Queue()
+        await connection.add_listener(database.INVALIDATION_CHANNEL, lambda *args: payloads.put_nowait(args[-1]))
+        try:
+            response = await asyncio.to_thread(
+                writer.post, "/score", json={"user_id": "bob#0002", "facet": "bonus", "amount": 2, "guild_id": "222"}
+            )
+            assert response.status_code == 200
+            return json.loads(await asyncio.wait_for(payloads.get(), timeout=5))
+        finally:
+            await connection.close()
+
+    change = asyncio.run(notified_change())
+    assert change["kind"] == "scores"
+    assert change["guild_id"] == "222"
+    assert change["version"] == _stored_version(postgres_url, "222") == 1
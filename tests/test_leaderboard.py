@@ -0,0 +1,45 @@
+from database import add_score, add_team, add_user_to_team, get_leaderboard_with_facets
+from models import ScoreUpdate
+
+FACETS = ["bonus", "daily_journaling"]
+
+
+def _seed(run_db, scores, teams=None):
+    async def seed(db):
+        for user_id, facet, amount in scores:
+            await add_score(db, ScoreUpdate(user_id=user_id, facet=facet, amount=amount))
+        teams_by_user = teams or {}
+        for team_name in sorted(set(teams_by_user.values())):
+            await add_team(db, "default", team_name)
+        for user_id, team_name in teams_by_user.items():
+            await add_user_to_team(db, "default", user_id, team_name)
+    run_db(seed)
+
+
+def _board(run_db, window="all", max_rank=None):
+    return run_db(lambda db: get_leaderboard_with_facets(db, "default", FACETS, window, max_rank))
+
+
+def test_all_time_board_pivots_facets_of_ranked_users(run_db):
+    _seed(run_db, [
+        ("alice", "bonus", 5), ("alice", "daily_journaling", 3),
+        ("bob", "bonus", 8),
+        ("carol", "daily_journaling", 2),
+    ], teams={"alice": "Owls"})
+
+    board = _board(run_db)
+
+    assert board == [
+        {"user_id": "alice", "total_score": 8, "team_name": "Owls", "facets": {"bonus": 5, "daily_journaling": 3}},
+        {"user_id": "bob", "total_score": 8, "team_name": None, "facets": {"bonus": 8, "daily_journaling": 0}},
+        {"user_id": "carol", "total_score": 2, "team_name": None, "facets": {"bonus": 0, "daily_journaling": 2}},
+    ]
+    # The windowed path aggregates the rollups instead and agrees on fresh scores
+    assert sorted(_board(run_db, "day"), key=lambda user: user["user_id"]) == sorted(board, key=lambda user: user["user_id"])
+
+
+def test_all_time_board_keeps_dense_ranks_within_max_rank(run_db):
+    _seed(run_db, [("a", "bonus", 9), ("b", "bonus", 9), ("c", "bonus", 7), ("d", "bonus", 4), ("e", "bonus", 1)])
+
+    assert [user["user_id"] for user in _board(run_db, max_rank=2)] == ["a", "b", "c"]
+    assert [user["user_id"] for user in _board(run_db, max_rank=10)] == ["a", "b", "c", "d", "e"]
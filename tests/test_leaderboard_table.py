@@ -0,0 +1,53 @@
+import re
+from pathlib import Path
+
+HOSTILE_TEAM = '<img src=x onerror="alert(1)">'
+
+
+def _table(client, **params):
+    query = {"draw": 1, "columns[3][data]": "total_score", "order[0][column]": 3, "order[0][dir]": "desc", **params}
+    response = client.get("/leaderboard/table", params=query)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _add_member(client, user, team, amount=5):
+    client.post("/create_team", json={"name": team})
+    assert client.post("/score", json={"user_id": user, "facet": "bonus", "amount": amount}).status_code == 200
+    assert client.post("/assign_user_to_team", json={"user_name": user, "team_name": team}).status_code == 200
+
+
+def test_hostile_team_name_is_data_not_markup(client):
+    _add_member(client, "mallory#0001", HOSTILE_TEAM)
+
+    # The table endpoint returns the name as-is; escaping it is the client's job
+    rows = _table(client)["data"]
+    assert rows[0]["team_name"] == HOSTILE_TEAM
+
+    # Server-rendered pages escape it
+    for page in ("/teams", "/users"):
+        html = client.get(page).text
+        assert HOSTILE_TEAM not in html
+        assert "&lt;img src=x onerror=" in html
+
+
+def test_full_leaderboard_columns_render_as_text():
+    script = (Path(__file__).parent.parent / "static" / "script.js").read_text()
+    init = script[script.index("$('#fullLeaderboard').length"):]
+    column = re.search(r"return (\{.*\});", init).group(1)
+    assert '"render": DataTable.render.text()' in column
+
+
+def test_search_matches_user_or_team_prefix(client):
+    _add_member(client, "alice#0001", "Owls", amount=10)
+    _add_member(client, "bob#0002", "Otters", amount=5)
+    _add_member(client, "carol#0003", "Bears", amount=1)
+
+    def search(term):
+        result = _table(client, **{"search[value]": term})
+        return result["recordsFiltered"], [row["user_id"] for row in result["data"]]
+
+    assert search("O") == (2, ["alice#0001", "bob#0002"])
+    assert search("car") == (1, ["carol#0003"])
+    assert search("bo") == (1, ["bob#0002"])
+    assert search("%") == (0, [])
@@ -0,0 +1,23 @@
+from prometheus_client import REGISTRY
+
+FORWARDED = {"X-Forwarded-Proto": "https", "X-Forwarded-Host": "board.example.com"}
+
+
+def _request_count(route: str) -> float:
+    labels = {"method": "GET", "route": route, "status": "2xx"}
+    return REGISTRY.get_sample_value("leaderboard_http_request_duration_seconds_count", labels) or 0.0
+
+
+def test_forwarded_request_keeps_route_label(client):
+    before = _request_count("/top/{k}")
+    unmatched_before = _request_count("<unmatched>")
+
+    assert client.get("/top/3", headers=FORWARDED).status_code == 200
+
+    assert _request_count("/top/{k}") == before + 1
+    assert _request_count("<unmatched>") == unmatched_before
+
+
+def test_forwarded_scheme_and_host_reach_url_for(client):
+    html = client.get("/leaderboard/all", headers=FORWARDED).text
+    assert 'href="https://board.example.com/static/style.css"' in html
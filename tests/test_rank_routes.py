@@ -0,0 +1,18 @@
+import inspect
+
+import routes
+
+
+def test_rank_index_routes_run_on_the_event_loop():
+    # Sync routes and dependencies run in the threadpool, concurrently with score writes updating the skiplist
+    for endpoint in (routes.get_user_rank_route, routes.get_top_route, routes.check_etag):
+        assert inspect.iscoroutinefunction(endpoint), endpoint.__name__
+
+
+def test_rank_and_top_follow_writes(client):
+    for user_id, amount in (("alice", 5), ("bob", 9), ("carol", 5)):
+        client.post("/score", json={"user_id": user_id, "facet": "bonus", "amount": amount})
+
+    assert client.get("/rank/alice").json()["rank"] == 2
+    assert client.get("/rank/nobody").status_code == 404
+    assert [user["user_id"] for user in client.get("/top/2").json()] == ["bob", "alice", "carol"]
@@ -0,0 +1,28 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from render_worker import RenderWorkerPool
+
+
+def _stage_count(stage: str) -> float:
+    return REGISTRY.get_sample_value("leaderboard_render_duration_seconds_count", {"stage": stage}) or 0.0
+
+
+def test_worker_stage_timings_reach_api_metrics():
+    board = [{"user_id": "alice", "total_score": 5, "team_name": "Owls", "facets": {"bonus": 5}, "rank": 1}]
+    teams = [{"team_name": "Owls", "total_score": 5, "rank": 1}]
+    before = {stage: _stage_count(stage) for stage in ("draw", "queue", "worker")}
+
+    async def render():
+        pool = RenderWorkerPool(workers=1)
+        try:
+            return await pool.render("pillow", (board, teams, ["bonus"], "all"))
+        finally:
+            await pool.stop()
+
+    png = asyncio.run(render())
+
+    assert png.startswith(b"\x89PNG")
+    # The draw ran in the worker process, but is recorded in this one's registry (the one /metrics serves)
+    assert {stage: _stage_count(stage) - count for stage, count in before.items()} == {"draw": 1, "queue": 1, "worker": 1}
@@ -0,0 +1,54 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from database import add_score, add_scores
+from models import AsyncSessionLocal, Leaderboard, ScoreItem, ScoreUpdate, User, UserTotal
+
+WRITERS = 50
+
+
+async def _concurrent_scores(sessions):
+    """WRITERS sessions each add 2 points to the same new user and facet at once."""
+    async def score():
+        async with sessions() as db:
+            return (await add_score(db, ScoreUpdate(user_id="alice", facet="bonus", amount=2))).score
+
+    returned = await asyncio.gather(*(score() for _ in range(WRITERS)))
+    async with sessions() as db:
+        rows = (await db.execute(select(Leaderboard.score).where(Leaderboard.user_id == "alice"))).scalars().all()
+        users = (await db.execute(select(func.count()).select_from(User).where(User.name == "alice"))).scalar()
+        total = (await db.execute(select(UserTotal.total_score).where(UserTotal.user_id == "alice"))).scalar()
+    return returned, rows, users, total
+
+
+def _assert_no_lost_updates(returned, rows, users, total):
+    assert rows == [2 * WRITERS] # One row per (guild, user, facet), holding every increment
+    assert users == 1
+    assert total == 2 * WRITERS
+    assert sorted(returned) == list(range(2, 2 * WRITERS + 1, 2)) # Each upsert saw the ones committed before it
+
+
+def test_concurrent_score_writes_postgres(run_postgres):
+    _assert_no_lost_updates(*run_postgres(_concurrent_scores))
+
+
+def test_concurrent_score_writes_sqlite(run_db):
+    _assert_no_lost_updates(*run_db(lambda _db: _concurrent_scores(AsyncSessionLocal)))
+
+
+def test_concurrent_batches_sharing_users_postgres(run_postgres):
+    """Batches naming the same users in opposite orders lock their rows in one order, so none deadlocks."""
+    user_ids = [f"user{i}" for i in range(200)]
+    batch_count = 10
+
+    async def batches(sessions):
+        async def batch(ids):
+            async with sessions() as db:
+                await add_scores(db, "default", [ScoreItem(user_id=user_id, facet="bonus", amount=1) for user_id in ids])
+
+        await asyncio.gather(*(batch(user_ids if i % 2 else user_ids[::-1]) for i in range(batch_count)))
+        async with sessions() as db:
+            return (await db.execute(select(UserTotal.total_score).order_by(UserTotal.user_id))).scalars().all()
+
+    assert run_postgres(batches) == [batch_count] * len(user_ids)
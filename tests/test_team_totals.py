@@ -0,0 +1,53 @@
+import asyncio
+
+from database import add_score, add_team, add_user_to_team, verify_totals
+from models import ScoreUpdate
+
+
+def test_team_moves_and_score_writes_keep_totals_consistent(run_postgres):
+    """A user moving between teams while their scores are written must leave every team total matching its members."""
+    async def race(sessions):
+        async with sessions() as db:
+            await add_team(db, "default", "Owls")
+            await add_team(db, "default", "Otters")
+            await add_score(db, ScoreUpdate(user_id="alice", facet="bonus", amount=1))
+
+        async def score():
+            async with sessions() as db:
+                await add_score(db, ScoreUpdate(user_id="alice", facet="bonus", amount=1))
+
+        async def move(team_name):
+            async with sessions() as db:
+                await add_user_to_team(db, "default", "alice", team_name)
+
+        for round_ in range(20):
+            await asyncio.gather(*(score() for _ in range(3)), move("Owls" if round_ % 2 else "Otters"), score())
+
+        async with sessions() as db:
+            return await verify_totals(db)
+
+    assert run_postgres(race) == {"users": [], "teams": []}
+
+
+def test_opposite_team_moves_do_not_deadlock(run_postgres):
+    """Users swapping between the same two teams at once lock both team totals, always in the same order."""
+    async def swaps(sessions):
+        async with sessions() as db:
+            await add_team(db, "default", "Owls")
+            await add_team(db, "default", "Otters")
+            for user_id, team_name in [(f"owl{i}", "Owls") for i in range(5)] + [(f"otter{i}", "Otters") for i in range(5)]:
+                await add_score(db, ScoreUpdate(user_id=user_id, facet="bonus", amount=1))
+                await add_user_to_team(db, "default", user_id, team_name)
+
+        async def move(user_id, team_name):
+            async with sessions() as db:
+                await add_user_to_team(db, "default", user_id, team_name)
+
+        for round_ in range(40):
+            owls, otters = ("Owls", "Otters") if round_ % 2 else ("Otters", "Owls")
+            await asyncio.gather(*(move(f"owl{i}", owls) for i in range(5)), *(move(f"otter{i}", otters) for i in range(5)))
+
+        async with sessions() as db:
+            return await verify_totals(db)
+
+    assert run_postgres(swaps) == {"users": [], "teams": []}
@@ -0,0 +1,29 @@
+def _pages(client, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/get_users_with_scores_page", params=params).json()
+        pages.append([user["user_id"] for user in page["users"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def _add_users(client, count):
+    for i in range(count):
+        client.post("/score", json={"user_id": f"user{i:02d}", "facet": "bonus", "amount": 100 - i})
+
+
+def test_exact_multiple_of_page_size_has_no_empty_page(client):
+    _add_users(client, 6)
+    assert _pages(client, 3) == [["user00", "user01", "user02"], ["user03", "user04", "user05"]]
+
+
+def test_partial_last_page(client):
+    _add_users(client, 5)
+    pages = _pages(client, 2)
+    assert pages == [["user00", "user01"], ["user02", "user03"], ["user04"]]
+
+
+def test_empty_board_has_one_empty_page(client):
+    assert _pages(client, 20) == [[]]